@@ -12,11 +12,19 @@ Added features:
 Requires: python-telegram-bot v20+
 """
 
+import asyncio
 import os
+import queue
+import random
+import re
 import sqlite3
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Optional
+from functools import lru_cache
+from typing import Optional
 
 from telegram import (
     Update,
@@ -37,65 +45,156 @@ from telegram.ext import (
 from telegram.error import BadRequest
 
 # --- CloudTips polling config (replaces webhook) ---
-import requests
+import httpx
 CLOUDTIPS_POLL_URL = os.getenv('https://server-1-h1gw.onrender.com/payments', '')  # e.g. https://your-proxy.example.com/payments
 CLOUDTIPS_API_KEY = os.getenv('CLOUDTIPS_API_KEY', '')    # optional
-POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', '30'))
+# adaptive poll pacing: start at MIN, stretch by the multiplier while idle,
+# never beyond MAX (POLL_INTERVAL kept as a legacy alias for MIN)
+POLLING_MIN_INTERVAL = int(os.getenv('POLLING_MIN_INTERVAL', os.getenv('POLL_INTERVAL', '30')))
+POLLING_MAX_INTERVAL = int(os.getenv('POLLING_MAX_INTERVAL', '600'))
+POLLING_BACKOFF_MULTIPLIER = float(os.getenv('POLLING_BACKOFF_MULTIPLIER', '1.5'))
+
+# Shared async client: keeps the TCP/TLS connection to the CloudTips proxy
+# alive between polls instead of handshaking on every request.
+_cloudtips_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_cloudtips_client() -> httpx.AsyncClient:
+    global _cloudtips_client
+    if _cloudtips_client is None:
+        _cloudtips_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+    return _cloudtips_client
+
+
+async def _post_init(application) -> None:
+    # create the client on the running loop instead of lazily mid-poll
+    _get_cloudtips_client()
+
+
+async def _post_shutdown(application) -> None:
+    global _cloudtips_client
+    if _cloudtips_client is not None:
+        await _cloudtips_client.aclose()
+        _cloudtips_client = None
+
+
+def _extract_order_id(payment) -> Optional[int]:
+    """Pull the order id out of a CloudTips payment record, or None."""
+    if not (payload := payment.get('payload')) and isinstance(d := payment.get('data'), dict):
+        payload = d.get('payload')
+    if not payload:
+        return None
+    try:
+        return int(payload)
+    except Exception:
+        return None
 
-def poll_cloudtips_once(application):
+
+# keep concurrent sends under Telegram's ~30 msg/s global limit
+_send_semaphore = asyncio.Semaphore(25)
+
+
+async def _send_limited(coro):
+    async with _send_semaphore:
+        return await coro
+
+
+async def poll_cloudtips_once(application):
+    """Poll the CloudTips proxy once. Returns the number of newly confirmed payments."""
+    confirmed = 0
+    paid_events = []  # (order_id, buyer_tg_id or None) for this poll's batch
     if not CLOUDTIPS_POLL_URL:
-        return
+        return confirmed
     headers = {}
     if CLOUDTIPS_API_KEY:
         headers['Authorization'] = f'Bearer {CLOUDTIPS_API_KEY}'
     try:
-        resp = requests.get(CLOUDTIPS_POLL_URL, headers=headers, timeout=10)
+        resp = await _get_cloudtips_client().get(CLOUDTIPS_POLL_URL, headers=headers)
         if resp.status_code != 200:
             logger.warning('CloudTips poll returned status %s', resp.status_code)
-            return
+            return confirmed
         data = resp.json()
         if not isinstance(data, list):
             logger.warning('CloudTips poll returned unexpected JSON (not list).')
-            return
-        for payment in data:
-            try:
-                status = payment.get('status')
-                payload = payment.get('payload')
-                if not payload and isinstance(payment.get('data'), dict):
-                    payload = payment.get('data').get('payload')
-                if not payload:
-                    continue
-                try:
-                    order_id = int(payload)
-                except Exception:
-                    continue
-                if status == 'paid' and order_id is not None:
-                    row = db_execute('SELECT status, user_id FROM orders WHERE id=?', (order_id,), fetch=True)
-                    if not row:
-                        continue
-                    cur_status, user_id = row[0]
-                    if cur_status in ('paid','done'):
-                        continue
-                    db_execute("UPDATE orders SET status=?, admin_notes=? WHERE id=?", ('paid', 'Оплата подтверждена автоматически (CloudTips polling)', order_id))
-                    # notify buyer
-                    tg_row = db_execute('SELECT tg_id FROM users WHERE id=?', (user_id,), fetch=True)
-                    if tg_row:
-                        try:
-                            application.bot.send_message(chat_id=tg_row[0][0], text=f"💳 Оплата подтверждена автоматически!\nВаш заказ #{order_id} оплачен.")
-                        except Exception:
-                            logger.exception('Failed to notify buyer after cloudtips poll')
-                    try:
-                        application.bot.send_message(chat_id=ADMIN_CHAT_ID, text=f"🔔 Автоматически подтверждена оплата заказа #{order_id} (CloudTips polling)." )
-                    except Exception:
-                        logger.exception('Failed to notify admin after cloudtips poll')
-            except Exception:
-                logger.exception('Error processing payment record from poll')
+            return confirmed
+        # first pass: just collect paid order ids (deduplicated, in order)
+        candidates = list(dict.fromkeys(
+            oid for payment in data
+            if payment.get('status') == 'paid' and (oid := _extract_order_id(payment)) is not None
+        ))
+        if candidates:
+            # one SELECT for every order still awaiting payment, one UPDATE
+            # flipping them all - instead of 3 statements per payment
+            placeholders, params = _in_params(candidates)
+            rows = await db_execute_async(
+                f"SELECT o.id, u.tg_id FROM orders o LEFT JOIN users u ON u.id=o.user_id "
+                f"WHERE o.id IN ({placeholders}) AND o.status NOT IN ('paid','done')",
+                params, fetch=True) or []
+            if rows:
+                placeholders, params = _in_params([r[0] for r in rows])
+                await db_execute_async(
+                    f"UPDATE orders SET status='paid', admin_notes=? WHERE id IN ({placeholders})",
+                    ('Оплата подтверждена автоматически (CloudTips polling)', *params))
+                confirmed = len(rows)
+                _invalidate_stats_cache()
+                paid_events = list(rows)
+        await _notify_paid_orders(application, paid_events)
     except Exception:
         logger.exception('CloudTips polling request failed')
+    return confirmed
+
+
+async def _notify_paid_orders(application, paid_events) -> None:
+    """Notify buyers + admin group about confirmed payments in one concurrent
+    batch; large batches collapse into a single admin digest message."""
+    if not paid_events:
+        return
+    coros = [
+        _send_limited(application.bot.send_message(
+            chat_id=buyer_tg_id,
+            text=f"💳 Оплата подтверждена автоматически!\nВаш заказ #{order_id} оплачен."))
+        for order_id, buyer_tg_id in paid_events if buyer_tg_id
+    ]
+    if len(paid_events) > 3:
+        ids = ', '.join(f'#{order_id}' for order_id, _ in paid_events)
+        coros.append(_send_limited(application.bot.send_message(
+            chat_id=ADMIN_CHAT_ID,
+            text=f'🔔 Автоматически подтверждены оплаты заказов: {ids} (CloudTips polling).')))
+    else:
+        coros.extend(
+            _send_limited(application.bot.send_message(
+                chat_id=ADMIN_CHAT_ID,
+                text=f'🔔 Автоматически подтверждена оплата заказа #{order_id} (CloudTips polling).'))
+            for order_id, _ in paid_events
+        )
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for res in results:
+        if isinstance(res, Exception):
+            logger.warning('CloudTips notification failed: %s', res)
 
 async def cloudtips_poll_job(context):
+    """Self-rescheduling CloudTips poll with exponential backoff.
+
+    Quiet polls stretch the interval (×POLLING_BACKOFF_MULTIPLIER up to
+    POLLING_MAX_INTERVAL); any confirmed payment resets it to
+    POLLING_MIN_INTERVAL so active orders are picked up fast.
+    """
     app = context.application
-    poll_cloudtips_once(app)
+    confirmed = await poll_cloudtips_once(app)
+    interval = context.job.data or POLLING_MIN_INTERVAL
+    if confirmed:
+        interval = POLLING_MIN_INTERVAL
+    else:
+        interval = min(interval * POLLING_BACKOFF_MULTIPLIER, POLLING_MAX_INTERVAL)
+    context.job_queue.run_once(
+        cloudtips_poll_job,
+        when=interval * random.uniform(0.8, 1.2),
+        data=interval,
+        name='cloudtips_poll',
+    )
 
 # PUBG ID via explicit button flow
 async def enter_pubg_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -115,13 +214,14 @@ async def enter_pubg_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
 TG_BOT_TOKEN = os.getenv('TG_BOT_TOKEN', '8593344199:AAHQ2vA7XADGxkjV_xtwMSbOuRDA6ukR4Ik')
 OWNER_ID = int(os.getenv('OWNER_ID', '8473513085'))
 ADMIN_CHAT_ID = int(os.getenv('ADMIN_CHAT_ID', '-1003448809517'))
-NOTIFY_CHAT_IDS = [int(x) for x in os.getenv('NOTIFY_CHAT_IDS', '-1003448809517').split(',') if x.strip()]
+NOTIFY_CHAT_IDS = tuple(int(x) for x in os.getenv('NOTIFY_CHAT_IDS', '-1003448809517').split(',') if x.strip())
 DB_PATH = os.getenv('DB_PATH', 'metro_shop.db')
 
-# bot-level admin ids (owner + optional extra)
-ADMIN_IDS: List[int] = [OWNER_ID]
+# bot-level admin ids (owner + optional extra); frozenset for O(1) membership
+# checks in is_admin_tg, which runs on every admin message and callback
+ADMIN_IDS: frozenset = frozenset([OWNER_ID])
 if os.getenv('ADMIN_IDS'):
-    ADMIN_IDS = [int(x) for x in os.getenv('ADMIN_IDS').split(',') if x.strip()]
+    ADMIN_IDS = frozenset(int(x) for x in os.getenv('ADMIN_IDS').split(',') if x.strip())
 
 # Maximum number of performers per order
 MAX_WORKERS_PER_ORDER = int(os.getenv('MAX_WORKERS_PER_ORDER', '3'))
@@ -134,9 +234,45 @@ logger = logging.getLogger(__name__)
 
 
 # --- DB helpers ---
+# Small connection pool: connections live for the whole process (opening one
+# per query wastes syscalls and loses the page cache), and with WAL enabled
+# several readers can work concurrently while a writer commits.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+_pool: Optional['queue.Queue'] = None
+
+
+def _new_conn() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=512)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-20000')
+    conn.execute('PRAGMA mmap_size=268435456')
+    return conn
+
+
+def _get_pool() -> 'queue.Queue':
+    global _pool
+    if _pool is None:
+        pool = queue.Queue(maxsize=DB_POOL_SIZE)
+        for _ in range(DB_POOL_SIZE):
+            pool.put(_new_conn())
+        _pool = pool
+    return _pool
+
+
 def init_db() -> None:
     """Create tables and new columns. Use safe ALTERs where possible."""
-    conn = sqlite3.connect(DB_PATH)
+    pool = _get_pool()
+    conn = pool.get()
+    try:
+        _init_schema(conn)
+    finally:
+        pool.put(conn)
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
     cur = conn.cursor()
 
     # Base tables (existing)
@@ -146,7 +282,7 @@ def init_db() -> None:
         tg_id INTEGER UNIQUE,
         username TEXT,
         pubg_id TEXT,
-        registered_at TEXT
+        registered_at INTEGER
     )
     ''')
 
@@ -157,7 +293,7 @@ def init_db() -> None:
         description TEXT,
         price REAL NOT NULL,
         photo TEXT,
-        created_at TEXT
+        created_at INTEGER
     )
     ''')
 
@@ -167,7 +303,7 @@ def init_db() -> None:
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         product_id INTEGER,
         file_id TEXT,
-        created_at TEXT
+        created_at INTEGER
     )
     ''')
 
@@ -178,7 +314,7 @@ def init_db() -> None:
         product_id INTEGER,
         price REAL,
         status TEXT,
-        created_at TEXT,
+        created_at INTEGER,
         payment_screenshot_file_id TEXT,
         pubg_id TEXT,
         admin_notes TEXT
@@ -187,11 +323,26 @@ def init_db() -> None:
 
     # add columns to orders if not exists: started_at, done_at
     try:
-        cur.execute("ALTER TABLE orders ADD COLUMN started_at TEXT")
+        cur.execute("ALTER TABLE orders ADD COLUMN started_at INTEGER")
     except Exception:
         pass
     try:
-        cur.execute("ALTER TABLE orders ADD COLUMN done_at TEXT")
+        cur.execute("ALTER TABLE orders ADD COLUMN done_at INTEGER")
+    except Exception:
+        pass
+
+    # denormalized catalog stats: updated at event time (review submitted /
+    # order done) so catalog pages stop rescanning reviews+orders
+    try:
+        cur.execute('ALTER TABLE products ADD COLUMN avg_rating REAL')
+        cur.execute('ALTER TABLE products ADD COLUMN review_count INTEGER DEFAULT 0')
+        cur.execute('ALTER TABLE products ADD COLUMN completed_count INTEGER DEFAULT 0')
+        cur.execute('''
+        UPDATE products SET
+            completed_count = (SELECT COUNT(*) FROM orders o WHERE o.product_id=products.id AND o.status='done'),
+            review_count = COALESCE((SELECT COUNT(r.rating) FROM reviews r JOIN orders o ON r.order_id=o.id WHERE o.product_id=products.id), 0),
+            avg_rating = (SELECT AVG(r.rating) FROM reviews r JOIN orders o ON r.order_id=o.id WHERE o.product_id=products.id)
+        ''')
     except Exception:
         pass
 
@@ -201,7 +352,7 @@ def init_db() -> None:
         order_id INTEGER,
         worker_id INTEGER,
         worker_username TEXT,
-        taken_at TEXT
+        taken_at INTEGER
     )
     ''')
 
@@ -214,7 +365,7 @@ def init_db() -> None:
         worker_id INTEGER,
         rating INTEGER,
         text TEXT,
-        created_at TEXT
+        created_at INTEGER
     )
     ''')
 
@@ -225,29 +376,198 @@ def init_db() -> None:
         order_id INTEGER,
         worker_id INTEGER,
         amount REAL,
-        created_at TEXT
+        created_at INTEGER
     )
     ''')
 
-    conn.commit()
-    conn.close()
+    # denormalized per-worker aggregates, kept current by triggers so
+    # /worker and the product cards read one row instead of scanning
+    # reviews/worker_payouts
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS worker_stats (
+        worker_id INTEGER PRIMARY KEY,
+        sum_rating INTEGER DEFAULT 0,
+        n_reviews INTEGER DEFAULT 0,
+        total_payout REAL DEFAULT 0,
+        n_done INTEGER DEFAULT 0
+    )
+    ''')
+    cur.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_reviews_ai AFTER INSERT ON reviews
+    WHEN NEW.rating IS NOT NULL AND NEW.worker_id IS NOT NULL
+    BEGIN
+        INSERT INTO worker_stats (worker_id, sum_rating, n_reviews)
+        VALUES (NEW.worker_id, NEW.rating, 1)
+        ON CONFLICT(worker_id) DO UPDATE SET
+            sum_rating = sum_rating + NEW.rating,
+            n_reviews = n_reviews + 1;
+    END
+    ''')
+    cur.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_payouts_ai AFTER INSERT ON worker_payouts
+    WHEN NEW.worker_id IS NOT NULL
+    BEGIN
+        INSERT INTO worker_stats (worker_id, total_payout, n_done)
+        VALUES (NEW.worker_id, NEW.amount, 1)
+        ON CONFLICT(worker_id) DO UPDATE SET
+            total_payout = total_payout + NEW.amount,
+            n_done = n_done + 1;
+    END
+    ''')
+    # backfill once for databases that predate worker_stats
+    if cur.execute('SELECT COUNT(*) FROM worker_stats').fetchone()[0] == 0:
+        cur.execute('''
+        INSERT INTO worker_stats (worker_id, sum_rating, n_reviews, total_payout, n_done)
+        SELECT ids.worker_id,
+               COALESCE((SELECT SUM(rating) FROM reviews r WHERE r.worker_id=ids.worker_id), 0),
+               COALESCE((SELECT COUNT(rating) FROM reviews r WHERE r.worker_id=ids.worker_id), 0),
+               COALESCE((SELECT SUM(amount) FROM worker_payouts p WHERE p.worker_id=ids.worker_id), 0),
+               COALESCE((SELECT COUNT(*) FROM worker_payouts p WHERE p.worker_id=ids.worker_id), 0)
+        FROM (SELECT worker_id FROM reviews WHERE worker_id IS NOT NULL
+              UNION SELECT worker_id FROM worker_payouts WHERE worker_id IS NOT NULL) ids
+        ''')
+
+    # one-time migration: performer usernames are stored @-prefixed now
+    cur.execute("UPDATE order_workers SET worker_username='@'||worker_username "
+                "WHERE worker_username IS NOT NULL AND worker_username<>'' AND worker_username NOT LIKE '@%'")
+
+    # indexes for the hot lookups (users.tg_id is already UNIQUE)
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_orders_product_status ON orders(product_id, status)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_reviews_order ON reviews(order_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_reviews_worker ON reviews(worker_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_order_workers_order ON order_workers(order_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_product_photos_pid ON product_photos(product_id)')
+    # composite forms replace the earlier single-column versions: the worker
+    # index becomes covering for the stats JOIN, the status index serves the
+    # 'newest first' admin listing without a sort
+    cur.execute('DROP INDEX IF EXISTS idx_order_workers_worker')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_ow_worker_order ON order_workers(worker_id, order_id)')
+    cur.execute('DROP INDEX IF EXISTS idx_orders_status')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders(status, id DESC)')
 
 
 def db_execute(query: str, params: tuple = (), fetch: bool = False):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(query, params)
-    data = None
-    if fetch:
-        data = cur.fetchall()
-    else:
-        conn.commit()
-    conn.close()
-    return data
+    pool = _get_pool()
+    conn = pool.get()
+    try:
+        # busy_timeout covers writer contention inside SQLite; this retry
+        # catches the rare 'database is locked' that still escapes it
+        for attempt in range(5):
+            try:
+                cur = conn.execute(query, params)
+                break
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc) or attempt == 4:
+                    raise
+                time.sleep(0.01)
+        if fetch:
+            return cur.fetchall()
+        return None
+    finally:
+        pool.put(conn)
+
+
+# Dedicated executor for SQLite work, sized to the connection pool so DB
+# threads never queue behind unrelated to_thread jobs (or vice versa).
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='sqlite')
+
+
+async def db_execute_async(query: str, params: tuple = (), fetch: bool = False):
+    """Async wrapper around db_execute: runs the blocking SQLite call on the
+    DB executor so handlers don't stall the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, db_execute, query, params, fetch)
+
+
+def db_insert(query: str, params: tuple = ()) -> int:
+    """Run an INSERT and return the new row id (cursor.lastrowid)."""
+    pool = _get_pool()
+    conn = pool.get()
+    try:
+        cur = conn.execute(query, params)
+        return cur.lastrowid
+    finally:
+        pool.put(conn)
+
+
+async def db_insert_async(query: str, params: tuple = ()) -> int:
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, db_insert, query, params)
+
+
+def db_execute_script(statements, fetch_first: bool = False):
+    """Run several (sql, params) statements in one transaction.
+
+    Used where related writes must land together (e.g. deleting a product and
+    its photos) - one commit instead of one per statement, and no window where
+    only half of them happened. With fetch_first=True the rows produced by the
+    first statement (e.g. a RETURNING clause) are returned.
+    """
+    pool = _get_pool()
+    conn = pool.get()
+    try:
+        conn.execute('BEGIN')
+        try:
+            first_rows = None
+            for i, (sql, params) in enumerate(statements):
+                cur = conn.execute(sql, params)
+                if i == 0 and fetch_first:
+                    first_rows = cur.fetchall()
+            conn.execute('COMMIT')
+            return first_rows
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        pool.put(conn)
+
+
+async def db_execute_script_async(statements, fetch_first: bool = False):
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, db_execute_script, statements, fetch_first)
+
+
+def db_execute_many(query: str, seq_of_params) -> None:
+    """executemany under one transaction - one commit/fsync for the whole batch."""
+    pool = _get_pool()
+    conn = pool.get()
+    try:
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(query, seq_of_params)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        pool.put(conn)
+
 
+async def db_execute_many_async(query: str, seq_of_params) -> None:
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, db_execute_many, query, seq_of_params)
 
-def now_iso() -> str:
-    return datetime.utcnow().isoformat()
+
+# Hot SQL hoisted to module constants: passing the identical string object on
+# every call lets SQLite's per-connection statement cache return the compiled
+# program instead of re-parsing the text.
+Q_ORDER_WORKERS = 'SELECT worker_id, worker_username FROM order_workers WHERE order_id=? ORDER BY id'
+Q_PRODUCT_NAME = 'SELECT name FROM products WHERE id=?'
+Q_USER_ID_PUBG_BY_TG = 'SELECT id, pubg_id FROM users WHERE tg_id=?'
+Q_UPSERT_USER = 'INSERT OR IGNORE INTO users (tg_id, username, registered_at) VALUES (?, ?, ?)'
+Q_PRODUCT_BRIEF = 'SELECT id, name, price FROM products WHERE id=?'
+Q_ORDER_STATE = 'SELECT status, product_id, price, created_at FROM orders WHERE id=?'
+Q_ORDER_WORKER_IDS = 'SELECT worker_id FROM order_workers WHERE order_id=?'
+Q_ORDER_BUYER_PRODUCT = 'SELECT u.tg_id, u.username, u.pubg_id, p.name FROM orders o JOIN users u ON o.user_id=u.id JOIN products p ON o.product_id=p.id WHERE o.id=?'
+
+
+def now_ts() -> int:
+    """Current time as Unix seconds - cheaper to write and compare than ISO text."""
+    return int(time.time())
+
+
+def _fmt_ts(ts) -> str:
+    """Render a stored timestamp for display; tolerates legacy ISO strings."""
+    if isinstance(ts, (int, float)):
+        return datetime.utcfromtimestamp(ts).isoformat(timespec='seconds')
+    return str(ts)
 
 
 def is_admin_tg(tg_id: int) -> bool:
@@ -265,74 +585,164 @@ CANCEL_BUTTON = ReplyKeyboardMarkup([[KeyboardButton('↩️ Назад')]], res
 
 ADMIN_PANEL_KB = ReplyKeyboardMarkup(
     [[KeyboardButton('➕ Добавить товар'), KeyboardButton('✏️ Редактировать товар'), KeyboardButton('🗑️ Удалить товар')],
-     [KeyboardButton('📋 Список заказов'), KeyboardButton('↩️ Назад')]],
+     [KeyboardButton('📋 Список заказов'), KeyboardButton('📊 Статистика бота'), KeyboardButton('↩️ Назад')]],
     resize_keyboard=True,
 )
 
 
 # --- Helper functions for order messages & performer list ---
-def format_performers_for_caption(order_id: int) -> str:
-    rows = db_execute('SELECT worker_id, worker_username FROM order_workers WHERE order_id=? ORDER BY id', (order_id,), fetch=True)
+def _format_performers(rows) -> str:
+    # usernames are stored @-prefixed since the chunk2-17 migration
     if not rows:
         return 'Исполнители: —'
-    parts = []
-    for worker_id, worker_username in rows:
-        if worker_username:
-            parts.append(f'@{worker_username}' if not worker_username.startswith('@') else worker_username)
-        else:
-            parts.append(str(worker_id))
-    return 'Исполнители: ' + ', '.join(parts)
+    return 'Исполнители: ' + ', '.join(str(u or wid) for wid, u in rows)
+
+
+# Admin captions are rebuilt on every take/leave/status callback; cache the
+# rendered performer line per order and drop it when order_workers changes.
+_performers_cache: OrderedDict = OrderedDict()
+PERFORMERS_CACHE_MAX = 1024
+
+
+def invalidate_performers(order_id: int) -> None:
+    _performers_cache.pop(order_id, None)
+
+
+def format_performers_for_caption(order_id: int) -> str:
+    cached = _performers_cache.get(order_id)
+    if cached is not None:
+        _performers_cache.move_to_end(order_id)
+        return cached
+    rows = db_execute(Q_ORDER_WORKERS, (order_id,), fetch=True)
+    text = _format_performers(rows)
+    _performers_cache[order_id] = text
+    if len(_performers_cache) > PERFORMERS_CACHE_MAX:
+        _performers_cache.popitem(last=False)
+    return text
+
+
+def _in_params(values):
+    """Placeholders + params for an IN clause, padded to the next power of two
+    with -1 sentinels (no row id is ever -1). Without padding every distinct
+    list length produces a new SQL string and defeats the statement cache."""
+    n = len(values)
+    k = 1 << (n - 1).bit_length() if n > 1 else 1
+    return ','.join('?' * k), tuple(values) + (-1,) * (k - n)
+
+
+def fetch_orders_with_workers(order_ids):
+    """Fetch performers for a whole batch of orders in one IN query.
+
+    Returns {order_id: [(worker_id, worker_username), ...]}; orders without
+    performers are simply absent. Used by list renderers to avoid one
+    order_workers query per row.
+    """
+    if not order_ids:
+        return {}
+    placeholders, params = _in_params(order_ids)
+    rows = db_execute(
+        f'SELECT order_id, worker_id, worker_username FROM order_workers WHERE order_id IN ({placeholders}) ORDER BY order_id, id',
+        params, fetch=True) or []
+    by_order = {}
+    for oid, wid, wname in rows:
+        by_order.setdefault(oid, []).append((wid, wname))
+    return by_order
+
+
+def _kb_pending(order_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton('✅ Подтвердить оплату', callback_data=f'confirm:{order_id}'),
+         InlineKeyboardButton('❌ Отклонить', callback_data=f'reject:{order_id}')],
+    ])
 
 
+def _kb_active(order_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton('🟢 Беру', callback_data=f'take:{order_id}'),
+         InlineKeyboardButton('🔴 Сняться', callback_data=f'leave:{order_id}')],
+        [InlineKeyboardButton('▶ Начать', callback_data=f'status:{order_id}:in_progress'),
+         InlineKeyboardButton('📦 На выдаче', callback_data=f'status:{order_id}:delivering'),
+         InlineKeyboardButton('🏁 Выполнено', callback_data=f'status:{order_id}:done')],
+    ])
+
+
+def _kb_info(order_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton('ℹ️ Просмотреть', callback_data=f'detail_order:{order_id}')],
+    ])
+
+
+# status -> keyboard factory; unknown/rejected statuses fall back to info-only
+_KB_BY_STATUS = {
+    'pending_verification': _kb_pending,
+    'awaiting_screenshot': _kb_pending,
+    'paid': _kb_active,
+    'in_progress': _kb_active,
+    'delivering': _kb_active,
+    'done': _kb_info,
+}
+
+
+@lru_cache(maxsize=512)
 def build_admin_keyboard_for_order(order_id: int, order_status: str) -> InlineKeyboardMarkup:
     """
     Build inline keyboard for admin-group order message.
     - If status pending_verification -> admin confirm/reject.
     - If paid or in progress -> show performer take/leave + status change buttons.
     - If rejected/done -> only info.
+
+    Keyboards are pure functions of (order_id, order_status) and PTB markup
+    objects are immutable, so memoize instead of rebuilding the object tree
+    on every caption edit.
     """
-    if order_status == 'pending_verification' or order_status == 'awaiting_screenshot':
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton('✅ Подтвердить оплату', callback_data=f'confirm:{order_id}'),
-             InlineKeyboardButton('❌ Отклонить', callback_data=f'reject:{order_id}')],
-        ])
-    elif order_status in ('paid', 'in_progress', 'delivering'):
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton('🟢 Беру', callback_data=f'take:{order_id}'),
-             InlineKeyboardButton('🔴 Сняться', callback_data=f'leave:{order_id}')],
-            [InlineKeyboardButton('▶ Начать', callback_data=f'status:{order_id}:in_progress'),
-             InlineKeyboardButton('📦 На выдаче', callback_data=f'status:{order_id}:delivering'),
-             InlineKeyboardButton('🏁 Выполнено', callback_data=f'status:{order_id}:done')],
-        ])
-    elif order_status == 'done':
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton('ℹ️ Просмотреть', callback_data=f'detail_order:{order_id}')],
-        ])
-    else:
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton('ℹ️ Просмотреть', callback_data=f'detail_order:{order_id}')],
-        ])
-    return kb
+    return _KB_BY_STATUS.get(order_status, _kb_info)(order_id)
+
+
+# The head of an admin caption (order id, buyer, product, price) never changes
+# while the order lives; cache it per order so the frequent status/performers
+# edits only re-render the volatile tail. Cleared when a product is edited.
+_caption_prefix_cache: OrderedDict = OrderedDict()
+CAPTION_PREFIX_CACHE_MAX = 1024
+
+
+def invalidate_caption_prefixes() -> None:
+    _caption_prefix_cache.clear()
 
 
-def build_caption_for_admin_message(order_id: int, buyer_tg: str, pubg_id: Optional[str], product: str, price: float, created_at: str, status: str, started_at: Optional[str] = None, done_at: Optional[str] = None) -> str:
+def build_caption_for_admin_message(order_id: int, buyer_tg: str, pubg_id: Optional[str], product: str, price: float, created_at: str, status: str, started_at: Optional[str] = None, done_at: Optional[str] = None, performers: Optional[str] = None) -> str:
+    prefix = _caption_prefix_cache.get(order_id)
+    if prefix is None:
+        prefix = '\n'.join([
+            f'📦 Заказ #{order_id}',
+            f'Пользователь: {buyer_tg}',
+            f'PUBG ID: {pubg_id or "не указан"}',
+            f'Товар: {product}',
+            f'Сумма: {price}₽',
+        ])
+        _caption_prefix_cache[order_id] = prefix
+        if len(_caption_prefix_cache) > CAPTION_PREFIX_CACHE_MAX:
+            _caption_prefix_cache.popitem(last=False)
+    else:
+        _caption_prefix_cache.move_to_end(order_id)
     base_lines = [
-        f'📦 Заказ #{order_id}',
-        f'Пользователь: {buyer_tg}',
-        f'PUBG ID: {pubg_id or "не указан"}',
-        f'Товар: {product}',
-        f'Сумма: {price}₽',
+        prefix,
         f'Статус: {status}',
-        f'Время: {created_at}',
+        f'Время: {_fmt_ts(created_at)}',
     ]
     if started_at:
-        base_lines.append(f'Начат: {started_at}')
+        base_lines.append(f'Начат: {_fmt_ts(started_at)}')
     if done_at:
-        base_lines.append(f'Выполнен: {done_at}')
-    base_lines.append(format_performers_for_caption(order_id))
+        base_lines.append(f'Выполнен: {_fmt_ts(done_at)}')
+    # callers rendering a batch pass the prefetched performer line instead of
+    # paying one order_workers query per caption
+    base_lines.append(performers if performers is not None else format_performers_for_caption(order_id))
     return '\n'.join(base_lines)
 
 
+# legacy quick-add format: 'price|name|desc'
+_QUICK_ADD_RE = re.compile(r'^\s*\d+(\.\d+)?\s*\|')
+
+
 # --- Special handler: ignore any messages in admin group (so bot doesn't reply to normal texts there) ---
 async def ignore_admin_group(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     return
@@ -352,8 +762,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     if user is None:
         return
-    db_execute('INSERT OR IGNORE INTO users (tg_id, username, registered_at) VALUES (?, ?, ?)',
-               (user.id, user.username or '', now_iso()))
+    await db_execute_async(Q_UPSERT_USER,
+               (user.id, user.username or '', now_ts()))
     text = (
         f"Привет, {user.first_name}!\n"
         "Добро пожаловать в Metro Shop — быстрый способ заказать сопровождение в Metro Royale.\n\n"
@@ -381,9 +791,10 @@ async def handle_review_flow(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not flow:
         return
 
-    # cancel
+    # cancel (reviews already collected in this flow are still written)
     if msg.text and msg.text.strip().lower() in ['/cancel', '↩️ назад']:
         context.user_data.pop('review_flow', None)
+        await _flush_pending_reviews(flow)
         await msg.reply_text('Оставление отзыва отменено.', reply_markup=MAIN_MENU)
         return
 
@@ -409,37 +820,56 @@ async def handle_review_flow(update: Update, context: ContextTypes.DEFAULT_TYPE)
             text_value = text
         order_id = flow['order_id']
         worker_id = flow['worker_id']
-        buyer_row = db_execute('SELECT id FROM users WHERE tg_id=?', (user.id,), fetch=True)
-        buyer_id = buyer_row[0][0] if buyer_row else None
-        db_execute('INSERT INTO reviews (order_id, buyer_id, worker_id, rating, text, created_at) VALUES (?, ?, ?, ?, ?, ?)',
-                   (order_id, buyer_id, worker_id, flow.get('temp_rating'), text_value, now_iso()))
+        buyer_id = flow.get('buyer_id')
+        if buyer_id is None:
+            buyer_row = await db_execute_async('SELECT id FROM users WHERE tg_id=?', (user.id,), fetch=True)
+            buyer_id = buyer_row[0][0] if buyer_row else None
+            flow['buyer_id'] = buyer_id
+        # collect the review; the whole flow is written in one transaction
+        # when the last worker is rated (or the flow is cancelled)
+        flow.setdefault('pending_reviews', []).append(
+            (order_id, buyer_id, worker_id, flow.get('temp_rating'), text_value, now_ts()))
         # mark done
         done_workers = flow.get('done_workers', [])
         done_workers.append(worker_id)
         flow['done_workers'] = done_workers
-        # check if there are remaining workers to review (from order_workers)
-        remaining = db_execute('SELECT worker_id, worker_username FROM order_workers WHERE order_id=? AND worker_id NOT IN ({seq})'.format(
-            seq=','.join(['?'] * (len(done_workers))) if done_workers else '0'
-        ), tuple([order_id] + done_workers), fetch=True) if done_workers else db_execute('SELECT worker_id, worker_username FROM order_workers WHERE order_id=?', (order_id,), fetch=True)
-
-        # The above SQL is a bit awkward; do a simpler approach: fetch all workers, then filter in Python.
-        all_ws = db_execute('SELECT worker_id, worker_username FROM order_workers WHERE order_id=? ORDER BY id', (order_id,), fetch=True)
-        remaining_workers = [w for w in all_ws if w[0] not in done_workers]
+        # the worker list was cached in the flow when it started; no DB call needed
+        workers = flow.get('workers')
+        if workers is None:
+            workers = await db_execute_async(Q_ORDER_WORKERS, (order_id,), fetch=True) or []
+            flow['workers'] = workers
+        done_set = set(done_workers)
+        remaining_workers = [w for w in workers if w[0] not in done_set]
 
         if remaining_workers:
             # ask for next worker
             next_worker = remaining_workers[0]
             flow['worker_id'] = next_worker[0]
             flow['stage'] = 'awaiting_rating'
-            await msg.reply_text(f'Оцените исполнителя @{next_worker[1]} (1-5)', reply_markup=CANCEL_BUTTON)
+            await msg.reply_text(f'Оцените исполнителя {next_worker[1] or next_worker[0]} (1-5)', reply_markup=CANCEL_BUTTON)
             return
         else:
             # done with all reviews in this flow
             context.user_data.pop('review_flow', None)
+            await _flush_pending_reviews(flow)
             await msg.reply_text('Спасибо за отзывы! Они помогут другим пользователям и исполнителям.', reply_markup=MAIN_MENU)
             return
 
 
+async def _flush_pending_reviews(flow) -> None:
+    """Write a review flow's collected rows in one transaction (N reviews ->
+    one commit) and fold their ratings into the product averages."""
+    rows = (flow or {}).pop('pending_reviews', None)
+    if not rows:
+        return
+    await db_execute_many_async(
+        'INSERT INTO reviews (order_id, buyer_id, worker_id, rating, text, created_at) VALUES (?, ?, ?, ?, ?, ?)', rows)
+    await db_execute_many_async(
+        'UPDATE products SET avg_rating=(COALESCE(avg_rating, 0)*review_count + ?)/(review_count + 1), '
+        'review_count=review_count + 1 WHERE id=(SELECT product_id FROM orders WHERE id=?)',
+        [(rating, order_id) for order_id, _buyer, _worker, rating, _text, _ts in rows])
+
+
 async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # ignore admin group messages
     if update.effective_chat and update.effective_chat.id == ADMIN_CHAT_ID:
@@ -468,53 +898,15 @@ async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         await admin_menu(update, context)
         return
 
-    if text == '📦 Каталог':
-        await products_handler(update, context)
-        return
-    if text == '🧾 Мои заказы':
-        await my_orders(update, context)
-        return
-    if text == '🎮 Привязать PUBG ID':
-        await update.message.reply_text('Отправьте ваш PUBG ID (ник или цифры), или нажмите ↩️ Назад.', reply_markup=CANCEL_BUTTON)
-        return
-    if text == '📞 Поддержка':
-        bot_username = context.bot.username or 'админ'
-        await update.message.reply_text('Свяжитесь с владельцем: @zavik911' + bot_username, reply_markup=MAIN_MENU)
-        return
-    if text == '↩️ Назад':
-        await update.message.reply_text('Вернулись в меню.', reply_markup=MAIN_MENU)
-        return
-
-    # Admin panel buttons
-    if text == '➕ Добавить товар' and is_admin_tg(user.id):
-        start_product_flow(context.user_data)
-        await update.message.reply_text('Добавление товара — шаг 1/4.\nВведите название товара или нажмите /cancel для отмены.', reply_markup=CANCEL_BUTTON)
+    # menu buttons: O(1) dict dispatch instead of a string-compare ladder
+    handler = ROUTES.get(text)
+    if handler is not None:
+        await handler(update, context)
         return
 
-    if text == '✏️ Редактировать товар' and is_admin_tg(user.id):
-        # start edit flow: ask product id (text flow)
-        context.user_data['edit_flow'] = {'stage': 'select', 'product_id': None}
-        prods = db_execute('SELECT id, name, price FROM products ORDER BY id', fetch=True)
-        if not prods:
-            await update.message.reply_text('Нет товаров для редактирования.', reply_markup=ADMIN_PANEL_KB)
-            context.user_data.pop('edit_flow', None)
-            return
-        lines = [f'ID {pid}: {name} — {price}₽' for pid, name, price in prods]
-        await update.message.reply_text('Выберите ID товара для редактирования:\n\n' + '\n'.join(lines), reply_markup=CANCEL_BUTTON)
-        return
-
-    if text == '🗑️ Удалить товар' and is_admin_tg(user.id):
-        prods = db_execute('SELECT id, name, price FROM products ORDER BY id', fetch=True)
-        if not prods:
-            await update.message.reply_text('Нет товаров для удаления.', reply_markup=ADMIN_PANEL_KB)
-            return
-        lines = [f'ID {pid}: {name} — {price}₽' for pid, name, price in prods]
-        await update.message.reply_text('Отправьте ID товара для удаления:\n\n' + '\n'.join(lines), reply_markup=CANCEL_BUTTON)
-        context.user_data['awaiting_delete_id'] = True
-        return
-
-    if text == '📋 Список заказов' and is_admin_tg(user.id):
-        await list_orders_admin(update, context)
+    handler = ADMIN_ROUTES.get(text)
+    if handler is not None and is_admin_tg(user.id):
+        await handler(update, context)
         return
 
     # PUBG ID entry STRICT: only via button flow
@@ -523,9 +915,9 @@ async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         if not candidate or ' ' in candidate or len(candidate) > 64:
             await update.message.reply_text('Неверный формат PUBG ID. Попробуйте ещё раз или нажмите ↩️ Назад.', reply_markup=CANCEL_BUTTON)
             return
-        db_execute('INSERT OR IGNORE INTO users (tg_id, username, registered_at) VALUES (?, ?, ?)',
-                   (user.id, user.username or '', now_iso()))
-        db_execute('UPDATE users SET pubg_id=? WHERE tg_id=?', (candidate, user.id))
+        await db_execute_async(Q_UPSERT_USER,
+                   (user.id, user.username or '', now_ts()))
+        await db_execute_async('UPDATE users SET pubg_id=? WHERE tg_id=?', (candidate, user.id))
         await update.message.reply_text(f'PUBG ID сохранён: {candidate}', reply_markup=MAIN_MENU)
         return
 
@@ -536,22 +928,67 @@ async def text_router(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         except Exception:
             await update.message.reply_text('Неверный ID.', reply_markup=ADMIN_PANEL_KB)
             return
-        row = db_execute('SELECT name FROM products WHERE id=?', (did,), fetch=True)
+        row = await db_execute_async(Q_PRODUCT_NAME, (did,), fetch=True)
         if not row:
             await update.message.reply_text('Товар с таким ID не найден.', reply_markup=ADMIN_PANEL_KB)
             return
-        db_execute('DELETE FROM products WHERE id=?', (did,))
+        await db_execute_script_async([
+            ('DELETE FROM products WHERE id=?', (did,)),
+            ('DELETE FROM product_photos WHERE product_id=?', (did,)),
+        ])
         await update.message.reply_text(f'Товар #{did} удалён.', reply_markup=ADMIN_PANEL_KB)
         return
 
-    # Admin add-product quick-format (legacy)
-    if '|' in text and is_admin_tg(user.id):
+    # Admin add-product quick-format (legacy); only trigger on the actual
+    # 'price|name|desc' shape so ordinary texts containing '|' pass through
+    if _QUICK_ADD_RE.match(text) and is_admin_tg(user.id):
         await add_product_text_handler(update, context)
         return
 
     await update.message.reply_text('Неизвестная команда. Выберите действие в меню.', reply_markup=MAIN_MENU)
 
 
+# --- Menu button handlers (dispatched from ROUTES / ADMIN_ROUTES) ---
+async def pubg_prompt_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text('Отправьте ваш PUBG ID (ник или цифры), или нажмите ↩️ Назад.', reply_markup=CANCEL_BUTTON)
+
+
+async def support_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    bot_username = context.bot.username or 'админ'
+    await update.message.reply_text('Свяжитесь с владельцем: @zavik911' + bot_username, reply_markup=MAIN_MENU)
+
+
+async def back_to_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    await update.message.reply_text('Вернулись в меню.', reply_markup=MAIN_MENU)
+
+
+async def admin_add_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    start_product_flow(context.user_data)
+    await update.message.reply_text('Добавление товара — шаг 1/4.\nВведите название товара или нажмите /cancel для отмены.', reply_markup=CANCEL_BUTTON)
+
+
+async def admin_edit_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    # start edit flow: ask product id (text flow)
+    context.user_data['edit_flow'] = {'stage': 'select', 'product_id': None}
+    prods = await db_execute_async('SELECT id, name, price FROM products ORDER BY id', fetch=True)
+    if not prods:
+        await update.message.reply_text('Нет товаров для редактирования.', reply_markup=ADMIN_PANEL_KB)
+        context.user_data.pop('edit_flow', None)
+        return
+    lines = [f'ID {pid}: {name} — {price}₽' for pid, name, price in prods]
+    await update.message.reply_text('Выберите ID товара для редактирования:\n\n' + '\n'.join(lines), reply_markup=CANCEL_BUTTON)
+
+
+async def admin_delete_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    prods = await db_execute_async('SELECT id, name, price FROM products ORDER BY id', fetch=True)
+    if not prods:
+        await update.message.reply_text('Нет товаров для удаления.', reply_markup=ADMIN_PANEL_KB)
+        return
+    lines = [f'ID {pid}: {name} — {price}₽' for pid, name, price in prods]
+    await update.message.reply_text('Отправьте ID товара для удаления:\n\n' + '\n'.join(lines), reply_markup=CANCEL_BUTTON)
+    context.user_data['awaiting_delete_id'] = True
+
+
 # --- Add product interactive flow ---
 async def handle_add_product_flow(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles per-step interactive product addition: name -> price -> desc -> photo (and optional extra photos)"""
@@ -617,12 +1054,8 @@ async def handle_add_product_flow(update: Update, context: ContextTypes.DEFAULT_
         name = data.get('name')
         price = data.get('price')
         desc = data.get('description')
-        created = now_iso()
-        db_execute('INSERT INTO products (name, description, price, photo, created_at) VALUES (?, ?, ?, ?, ?)',
-                   (name, desc, price, photo, created))
-        # get product id
-        row = db_execute('SELECT id FROM products WHERE created_at=? ORDER BY id DESC LIMIT 1', (created,), fetch=True)
-        pid = row[0][0] if row else None
+        pid = await db_insert_async('INSERT INTO products (name, description, price, photo, created_at) VALUES (?, ?, ?, ?, ?)',
+                   (name, desc, price, photo, now_ts()))
         flow['data']['product_id'] = pid
         flow['stage'] = 'extra_photos'
         await msg.reply_text('Шаг 5/5 (опционально). Отправьте дополнительные фото по одному или нажмите ↩️ Назад, чтобы завершить.', reply_markup=CANCEL_BUTTON)
@@ -637,7 +1070,7 @@ async def handle_add_product_flow(update: Update, context: ContextTypes.DEFAULT_
                 await msg.reply_text('Ошибка: не найден product_id.', reply_markup=ADMIN_PANEL_KB)
                 clear_product_flow(context.user_data)
                 return
-            db_execute('INSERT INTO product_photos (product_id, file_id, created_at) VALUES (?, ?, ?)', (pid, photo, now_iso()))
+            await db_execute_async('INSERT INTO product_photos (product_id, file_id, created_at) VALUES (?, ?, ?)', (pid, photo, now_ts()))
             await msg.reply_text('Фото добавлено. Отправьте ещё фото или нажмите ↩️ Назад, чтобы завершить.', reply_markup=CANCEL_BUTTON)
             return
         else:
@@ -679,7 +1112,7 @@ async def handle_edit_product_flow(update: Update, context: ContextTypes.DEFAULT
         except Exception:
             await msg.reply_text('Неверный ID. Отправьте числовой ID товара, который хотите редактировать.')
             return
-        row = db_execute('SELECT id, name, price, description FROM products WHERE id=?', (pid,), fetch=True)
+        row = await db_execute_async('SELECT id, name, price, description FROM products WHERE id=?', (pid,), fetch=True)
         if not row:
             await msg.reply_text('Товар не найден. Попробуйте другой ID.')
             context.user_data.pop('edit_flow', None)
@@ -709,7 +1142,8 @@ async def handle_edit_product_flow(update: Update, context: ContextTypes.DEFAULT
             if not name:
                 await msg.reply_text('Название не может быть пустым. Введите название.')
                 return
-            db_execute('UPDATE products SET name=? WHERE id=?', (name, pid))
+            await db_execute_async('UPDATE products SET name=? WHERE id=?', (name, pid))
+            invalidate_caption_prefixes()
             await msg.reply_text(f'Название обновлено для #{pid}.', reply_markup=ADMIN_PANEL_KB)
         elif stage == 'editing_price':
             try:
@@ -719,11 +1153,12 @@ async def handle_edit_product_flow(update: Update, context: ContextTypes.DEFAULT
             except Exception:
                 await msg.reply_text('Неверная цена. Введите число, например: 300')
                 return
-            db_execute('UPDATE products SET price=? WHERE id=?', (price, pid))
+            await db_execute_async('UPDATE products SET price=? WHERE id=?', (price, pid))
+            invalidate_caption_prefixes()
             await msg.reply_text(f'Цена обновлена для #{pid}.', reply_markup=ADMIN_PANEL_KB)
         elif stage == 'editing_desc':
             desc = (msg.text or '').strip()
-            db_execute('UPDATE products SET description=? WHERE id=?', (desc, pid))
+            await db_execute_async('UPDATE products SET description=? WHERE id=?', (desc, pid))
             await msg.reply_text(f'Описание обновлено для #{pid}.', reply_markup=ADMIN_PANEL_KB)
         context.user_data.pop('edit_flow', None)
         return
@@ -739,12 +1174,21 @@ async def handle_edit_product_flow(update: Update, context: ContextTypes.DEFAULT
             await msg.reply_text('Ошибка состояния. Попробуйте заново.', reply_markup=ADMIN_PANEL_KB)
             return
         file_id = msg.photo[-1].file_id
-        db_execute('UPDATE products SET photo=? WHERE id=?', (file_id, pid))
+        await db_execute_async('UPDATE products SET photo=? WHERE id=?', (file_id, pid))
         await msg.reply_text(f'Фото обновлено для #{pid}.', reply_markup=ADMIN_PANEL_KB)
         context.user_data.pop('edit_flow', None)
         return
 
 
+# field -> (edit_flow stage, prompt shown to the admin)
+_EDIT_FIELD_MAP = {
+    'name': ('editing_name', 'Введите новое название товара (текст).'),
+    'price': ('editing_price', 'Введите новую цену (число).'),
+    'desc': ('editing_desc', 'Введите новое описание.'),
+    'photo': ('editing_photo', 'Отправьте новое фото (в виде фото).'),
+}
+
+
 # Callback to handle which field admin chooses to edit
 async def editfield_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     q = update.callback_query
@@ -774,31 +1218,15 @@ async def editfield_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     # set edit_flow state and ask for value accordingly
-    context.user_data['edit_flow'] = {'stage': None, 'product_id': pid}
-    if field == 'name':
-        context.user_data['edit_flow']['stage'] = 'editing_name'
-        try:
-            await q.message.reply_text('Введите новое название товара (текст).', reply_markup=CANCEL_BUTTON)
-        except Exception:
-            pass
-    elif field == 'price':
-        context.user_data['edit_flow']['stage'] = 'editing_price'
-        try:
-            await q.message.reply_text('Введите новую цену (число).', reply_markup=CANCEL_BUTTON)
-        except Exception:
-            pass
-    elif field == 'desc':
-        context.user_data['edit_flow']['stage'] = 'editing_desc'
-        try:
-            await q.message.reply_text('Введите новое описание.', reply_markup=CANCEL_BUTTON)
-        except Exception:
-            pass
-    elif field == 'photo':
-        context.user_data['edit_flow']['stage'] = 'editing_photo'
-        try:
-            await q.message.reply_text('Отправьте новое фото (в виде фото).', reply_markup=CANCEL_BUTTON)
-        except Exception:
-            pass
+    entry = _EDIT_FIELD_MAP.get(field)
+    if entry is None:
+        return
+    stage, prompt = entry
+    context.user_data['edit_flow'] = {'stage': stage, 'product_id': pid}
+    try:
+        await q.message.reply_text(prompt, reply_markup=CANCEL_BUTTON)
+    except Exception:
+        pass
 
 
 # Callback to delete product by inline button (optional)
@@ -820,11 +1248,16 @@ async def delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     if not is_admin_tg(user.id):
         await q.answer(text='Только админы.', show_alert=True)
         return
-    row = db_execute('SELECT name FROM products WHERE id=?', (pid,), fetch=True)
+    # existence check and both deletes in one transaction: RETURNING tells us
+    # whether the product existed, and the photos can't be orphaned by a
+    # failure between the two statements
+    row = await db_execute_script_async([
+        ('DELETE FROM products WHERE id=? RETURNING id', (pid,)),
+        ('DELETE FROM product_photos WHERE product_id=?', (pid,)),
+    ], fetch_first=True)
     if not row:
         await q.edit_message_text('Товар не найден.')
         return
-    db_execute('DELETE FROM products WHERE id=?', (pid,))
     try:
         await q.edit_message_text(f'Товар #{pid} удалён.')
     except Exception:
@@ -851,7 +1284,7 @@ async def edit_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await q.answer(text='Только админы.', show_alert=True)
         return
 
-    row = db_execute('SELECT id, name, price FROM products WHERE id=?', (pid,), fetch=True)
+    row = await db_execute_async(Q_PRODUCT_BRIEF, (pid,), fetch=True)
     if not row:
         try:
             await q.edit_message_text('Товар не найден.')
@@ -875,34 +1308,42 @@ async def edit_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 
 # --- Products display and buy flows ---
-def _get_product_rating_and_count(pid: int):
-    """Compute average rating across reviews for workers on orders of this product and number of completed orders."""
-    # average rating: all reviews for orders where product_id == pid
-    rows = db_execute('SELECT r.rating FROM reviews r JOIN orders o ON r.order_id=o.id WHERE o.product_id=?', (pid,), fetch=True)
-    if not rows:
-        avg = None
-    else:
-        vals = [r[0] for r in rows if r[0] is not None]
-        avg = (sum(vals) / len(vals)) if vals else None
-    completed_count_row = db_execute('SELECT COUNT(*) FROM orders WHERE product_id=? AND status=?', (pid, 'done'), fetch=True)
-    completed_count = completed_count_row[0][0] if completed_count_row else 0
-    return avg, completed_count
-
-
 async def products_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    products = db_execute('SELECT id, name, description, price, photo FROM products ORDER BY id', fetch=True)
+    # the stats columns ride along in the main SELECT - no aggregation at all
+    products = await db_execute_async('SELECT id, name, description, price, photo, avg_rating, completed_count FROM products ORDER BY id', fetch=True)
     if not products:
         await update.message.reply_text('Каталог пуст. Админ может добавить товары.', reply_markup=MAIN_MENU)
         return
 
-    for pid, name, desc, price, photo in products:
-        avg, completed_count = _get_product_rating_and_count(pid)
-        rating_line = f"⭐ {avg:.1f} (отзывы)" if avg is not None else "—"
-        caption = f"🛒 *{name}*\n{desc or ''}\n\n💰 Цена: *{price}₽*\n{rating_line} • Выполнено: {completed_count}"
-        kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton(text=f'Купить — {price}₽', callback_data=f'buy:{pid}'),
-             InlineKeyboardButton(text='ℹ️ Подробнее', callback_data=f'detail:{pid}')]
-        ])
+    # cards go out concurrently: the user waits ~one round-trip instead of
+    # one per product (the semaphore keeps us under Telegram's rate limit)
+    await asyncio.gather(
+        *(_send_product_card(update, context, *p) for p in products),
+        return_exceptions=True,
+    )
+
+    if update.message:
+        await update.message.reply_text('Выберите товар, чтобы купить, или вернитесь в меню.', reply_markup=MAIN_MENU)
+
+
+DETAIL_BTN_TEXT = 'ℹ️ Подробнее'
+
+
+@lru_cache(maxsize=512)
+def _product_kb(pid, price) -> InlineKeyboardMarkup:
+    """Buy/detail keyboard for a catalog card; memoized since it only varies
+    with (pid, price) and markup objects are immutable."""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text=f'Купить — {price}₽', callback_data=f'buy:{pid}'),
+         InlineKeyboardButton(text=DETAIL_BTN_TEXT, callback_data=f'detail:{pid}')]
+    ])
+
+
+async def _send_product_card(update: Update, context: ContextTypes.DEFAULT_TYPE, pid, name, desc, price, photo, avg, completed_count) -> None:
+    rating_line = '—' if avg is None else f'⭐ {avg:.1f} (отзывы)'
+    caption = f"🛒 *{name}*\n{desc or ''}\n\n💰 Цена: *{price}₽*\n{rating_line} • Выполнено: {completed_count or 0}"
+    kb = _product_kb(pid, price)
+    async with _send_semaphore:
         try:
             if photo:
                 if update.message:
@@ -920,8 +1361,11 @@ async def products_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             except Exception:
                 logger.exception("Failed to send product %s", pid)
 
-    if update.message:
-        await update.message.reply_text('Выберите товар, чтобы купить, или вернитесь в меню.', reply_markup=MAIN_MENU)
+
+def _build_media_group(media, caption):
+    """Album items for a photo list: caption rides on the head photo only."""
+    return [InputMediaPhoto(media=media[0], caption=caption, parse_mode='Markdown'),
+            *(InputMediaPhoto(media=fid) for fid in media[1:])]
 
 
 # Product details callback
@@ -938,21 +1382,24 @@ async def product_detail_callback(update: Update, context: ContextTypes.DEFAULT_
         pid = int(pid_str)
     except ValueError:
         return
-    row = db_execute('SELECT name, description, price, photo FROM products WHERE id=?', (pid,), fetch=True)
+    # product fields, stats columns and extra photos in one round-trip;
+    # CHAR(31) (unit separator) can't occur in a Telegram file_id
+    row = await db_execute_async(
+        'SELECT p.name, p.description, p.price, p.photo, p.avg_rating, p.completed_count, '
+        'GROUP_CONCAT(pp.file_id, CHAR(31)) '
+        'FROM products p LEFT JOIN product_photos pp ON pp.product_id=p.id '
+        'WHERE p.id=? GROUP BY p.id', (pid,), fetch=True)
     if not row:
         try:
             await q.edit_message_text('Товар не найден.')
         except Exception:
             pass
         return
-    name, desc, price, photo = row[0]
-    avg, completed_count = _get_product_rating_and_count(pid)
+    name, desc, price, photo, avg, completed_count, extra_ids = row[0]
     rating_line = f"⭐ {avg:.1f} (по отзывам)" if avg is not None else "Нет оценок"
-    caption = f"*{name}*\n\n{desc or ''}\n\n💰 Цена: *{price}₽*\n{rating_line} • Выполнено: {completed_count}"
+    caption = f"*{name}*\n\n{desc or ''}\n\n💰 Цена: *{price}₽*\n{rating_line} • Выполнено: {completed_count or 0}"
 
-    # fetch extra photos
-    photos = db_execute('SELECT file_id FROM product_photos WHERE product_id=? ORDER BY id', (pid,), fetch=True) or []
-    file_ids = [p[0] for p in photos]
+    file_ids = extra_ids.split('\x1f') if extra_ids else []
     # include main photo as first if exists
     if photo:
         if not file_ids or file_ids[0] != photo:
@@ -973,16 +1420,13 @@ async def product_detail_callback(update: Update, context: ContextTypes.DEFAULT_
             if len(media) == 1:
                 await q.message.reply_photo(photo=media[0], caption=caption, parse_mode='Markdown', reply_markup=kb)
             else:
-                # first photo with caption, others as media
-                media_group = []
-                for i, fid in enumerate(media):
-                    if i == 0:
-                        media_group.append(InputMediaPhoto(media=fid, caption=caption, parse_mode='Markdown'))
-                    else:
-                        media_group.append(InputMediaPhoto(media=fid))
-                await q.message.reply_media_group(media=media_group)
-                # also send inline keyboard as a separate message (since media_group doesn't accept reply_markup for group)
-                await q.message.reply_text(' ', reply_markup=kb)
+                media_group = _build_media_group(media, caption)
+                # media_group can't carry reply_markup, so the keyboard rides a
+                # second message - fire both concurrently to halve the wait
+                await asyncio.gather(
+                    q.message.reply_media_group(media=media_group),
+                    q.message.reply_text('Действия:', reply_markup=kb),
+                )
         else:
             await q.message.reply_markdown(caption, reply_markup=kb)
     except Exception:
@@ -996,21 +1440,23 @@ async def my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     if user is None:
         return
-    row = db_execute('SELECT id FROM users WHERE tg_id=?', (user.id,), fetch=True)
+    row = await db_execute_async('SELECT id FROM users WHERE tg_id=?', (user.id,), fetch=True)
     if not row:
         await update.message.reply_text('Вы ещё не зарегистрированы.', reply_markup=MAIN_MENU)
         return
     user_db_id = row[0][0]
-    rows = db_execute(
+    rows = await db_execute_async(
         'SELECT o.id, p.name, o.price, o.status FROM orders o JOIN products p ON o.product_id=p.id WHERE o.user_id=? ORDER BY o.id DESC LIMIT 50',
         (user_db_id,), fetch=True)
     if not rows:
         await update.message.reply_text('У вас пока нет заказов.', reply_markup=MAIN_MENU)
         return
+    workers_by_order = await asyncio.get_running_loop().run_in_executor(
+        _db_executor, fetch_orders_with_workers, [r[0] for r in rows])
     lines = []
     for oid, pname, price, status in rows:
-        perf_rows = db_execute('SELECT worker_username FROM order_workers WHERE order_id=? ORDER BY id', (oid,), fetch=True)
-        perflist = ', '.join([r[0] or str(r[0]) for r in perf_rows]) if perf_rows else '-'
+        perf_rows = workers_by_order.get(oid)
+        perflist = ', '.join([wname or str(wname) for _wid, wname in perf_rows]) if perf_rows else '-'
         lines.append(f'#{oid} {pname} — {price}₽ — {status} — Исполнители: {perflist}')
     await update.message.reply_text('\n'.join(lines), reply_markup=MAIN_MENU)
 
@@ -1036,7 +1482,7 @@ async def buy_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     except ValueError:
         return
 
-    p = db_execute('SELECT id, name, price FROM products WHERE id=?', (pid,), fetch=True)
+    p = await db_execute_async(Q_PRODUCT_BRIEF, (pid,), fetch=True)
     if not p:
         try:
             await query.edit_message_text('Товар не найден.')
@@ -1048,29 +1494,22 @@ async def buy_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
     user = query.from_user
 
-    # --- FIXED: this block MUST be indented ---
-    db_execute(
-        'INSERT OR IGNORE INTO users (tg_id, username, registered_at) VALUES (?, ?, ?)',
-        (user.id, user.username or '', now_iso())
-    )
-    user_row = db_execute(
-        'SELECT id, pubg_id FROM users WHERE tg_id=?',
-        (user.id,), fetch=True
+    # upsert + read back in one round-trip (also refreshes a changed username)
+    user_row = await db_execute_async(
+        'INSERT INTO users (tg_id, username, registered_at) VALUES (?, ?, ?) '
+        'ON CONFLICT(tg_id) DO UPDATE SET username=excluded.username '
+        'RETURNING id, pubg_id',
+        (user.id, user.username or '', now_ts()), fetch=True
     )
-    user_db_id = user_row[0][0]
-    pubg_id = user_row[0][1]
+    user_db_id, pubg_id = user_row[0]
 
-    # create new order
-    db_execute(
+    # create new order; lastrowid gives us the id without a second query
+    # (and without the race two concurrent buys by the same user would hit)
+    order_id = await db_insert_async(
         'INSERT INTO orders (user_id, product_id, price, status, created_at, pubg_id) VALUES (?, ?, ?, ?, ?, ?)',
-        (user_db_id, prod_id, price, 'awaiting_screenshot', now_iso(), pubg_id)
+        (user_db_id, prod_id, price, 'awaiting_screenshot', now_ts(), pubg_id)
     )
-
-    # get inserted order id
-    order_id = db_execute(
-        'SELECT id FROM orders WHERE user_id=? ORDER BY id DESC LIMIT 1',
-        (user_db_id,), fetch=True
-    )[0][0]
+    _invalidate_stats_cache()
 
     # --- CloudTips dynamic payment link ---
     try:
@@ -1144,12 +1583,12 @@ async def payment_photo_handler(update: Update, context: ContextTypes.DEFAULT_TY
         return
     tg_id = user.id
 
-    user_row = db_execute('SELECT id, pubg_id FROM users WHERE tg_id=?', (tg_id,), fetch=True)
+    user_row = await db_execute_async(Q_USER_ID_PUBG_BY_TG, (tg_id,), fetch=True)
     if not user_row:
         await message.reply_text('Сначала выберите товар в каталоге.', reply_markup=MAIN_MENU)
         return
     user_db_id, pubg_id = user_row[0]
-    order_row = db_execute('SELECT id, product_id, price, created_at FROM orders WHERE user_id=? AND status=? ORDER BY id DESC LIMIT 1',
+    order_row = await db_execute_async('SELECT id, product_id, price, created_at FROM orders WHERE user_id=? AND status=? ORDER BY id DESC LIMIT 1',
                            (user_db_id, 'awaiting_screenshot'), fetch=True)
     if not order_row:
         await message.reply_text('У вас нет активных заказов, ожидающих скриншота.', reply_markup=MAIN_MENU)
@@ -1162,23 +1601,24 @@ async def payment_photo_handler(update: Update, context: ContextTypes.DEFAULT_TY
 
     photo = message.photo[-1]
     file_id = photo.file_id
-    db_execute('UPDATE orders SET payment_screenshot_file_id=?, status=? WHERE id=?', (file_id, 'pending_verification', order_id))
+    await db_execute_async('UPDATE orders SET payment_screenshot_file_id=?, status=? WHERE id=?', (file_id, 'pending_verification', order_id))
 
-    product = db_execute('SELECT name FROM products WHERE id=?', (product_id,), fetch=True)[0][0]
+    product = (await db_execute_async(Q_PRODUCT_NAME, (product_id,), fetch=True))[0][0]
     tg_username = user.username or f'{user.first_name} {user.last_name or ""}'.strip()
 
     # Build caption and keyboard (confirm/reject)
-    caption = build_caption_for_admin_message(order_id, f'@{tg_username}' if user.username else str(tg_id), pubg_id, product, price, created_at, 'pending_verification')
+    caption = await asyncio.get_running_loop().run_in_executor(_db_executor, build_caption_for_admin_message, order_id, f'@{tg_username}' if user.username else str(tg_id), pubg_id, product, price, created_at, 'pending_verification')
     kb = build_admin_keyboard_for_order(order_id, 'pending_verification')
 
     # Send to admin group. If bot not in group -> log and notify owner
     try:
         await context.bot.send_photo(chat_id=ADMIN_CHAT_ID, photo=file_id, caption=caption, reply_markup=kb)
-        for nid in NOTIFY_CHAT_IDS:
-            try:
-                await context.bot.send_message(chat_id=nid, text=f'Новый заказ #{order_id} ожидает проверки. Проверьте в админ-группе.')
-            except Exception:
-                pass
+        # fan the notify messages out concurrently; failures are ignored as before
+        await asyncio.gather(
+            *(context.bot.send_message(chat_id=nid, text=f'Новый заказ #{order_id} ожидает проверки. Проверьте в админ-группе.')
+              for nid in NOTIFY_CHAT_IDS),
+            return_exceptions=True,
+        )
         await message.reply_text('Скриншот отправлен админам для проверки. Ожидайте подтверждения.', reply_markup=MAIN_MENU)
     except Exception as e:
         logger.exception('Failed to send to admin group: %s', e)
@@ -1216,7 +1656,12 @@ async def admin_decision(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             pass
         return
 
-    order = db_execute('SELECT user_id, product_id, price, payment_screenshot_file_id, created_at FROM orders WHERE id=?', (order_id,), fetch=True)
+    # order + buyer + product in one JOIN instead of three sequential reads
+    order = await db_execute_async(
+        'SELECT o.user_id, o.product_id, o.price, o.payment_screenshot_file_id, o.created_at, '
+        'u.tg_id, u.username, u.pubg_id, p.name '
+        'FROM orders o LEFT JOIN users u ON u.id=o.user_id LEFT JOIN products p ON p.id=o.product_id '
+        'WHERE o.id=?', (order_id,), fetch=True)
     if not order:
         try:
             await query.answer(text='Заказ не найден.', show_alert=True)
@@ -1224,20 +1669,15 @@ async def admin_decision(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             pass
         return
 
-    user_id, product_id, price, file_id, created_at = order[0]
-    buyer_row = db_execute('SELECT tg_id, username, pubg_id FROM users WHERE id=?', (user_id,), fetch=True)
-    if not buyer_row:
-        buyer_tg = str(user_id)
-        pubg_id = None
-    else:
-        buyer_tg = f"@{buyer_row[0][1]}" if buyer_row[0][1] else str(buyer_row[0][0])
-        pubg_id = buyer_row[0][2]
-
-    product_name = db_execute('SELECT name FROM products WHERE id=?', (product_id,), fetch=True)[0][0]
+    user_id, product_id, price, file_id, created_at, buyer_tg_id, buyer_username, pubg_id, product_name = order[0]
+    buyer_tg = f'@{buyer_username}' if buyer_username else str(buyer_tg_id if buyer_tg_id is not None else user_id)
+    if product_name is None:
+        product_name = str(product_id)
 
     if action == 'confirm':
-        db_execute('UPDATE orders SET status=?, admin_notes=? WHERE id=?', ('paid', f'Оплачен и подтверждён админом {user.id}', order_id))
-        caption = build_caption_for_admin_message(order_id, buyer_tg, pubg_id, product_name, price, created_at, 'paid')
+        await db_execute_async('UPDATE orders SET status=?, admin_notes=? WHERE id=?', ('paid', f'Оплачен и подтверждён админом {user.id}', order_id))
+        _invalidate_stats_cache()
+        caption = await asyncio.get_running_loop().run_in_executor(_db_executor, build_caption_for_admin_message, order_id, buyer_tg, pubg_id, product_name, price, created_at, 'paid')
         kb = build_admin_keyboard_for_order(order_id, 'paid')
         try:
             await query.edit_message_caption(caption, reply_markup=kb)
@@ -1246,19 +1686,19 @@ async def admin_decision(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 await context.bot.send_message(chat_id=ADMIN_CHAT_ID, text=caption, reply_markup=kb)
             except Exception:
                 logger.exception('Failed to update admin message after confirm')
-        try:
-            await context.bot.send_message(chat_id=buyer_row[0][0], text=(f'Ваш заказ #{order_id} на \"{product_name}\" оплачен и подтверждён. Ожидайте исполнителей.'))
-        except Exception:
+        # notify buyer and the notify chats in one concurrent batch
+        coros = []
+        if buyer_tg_id:
+            coros.append(context.bot.send_message(chat_id=buyer_tg_id, text=(f'Ваш заказ #{order_id} на \"{product_name}\" оплачен и подтверждён. Ожидайте исполнителей.')))
+        coros.extend(context.bot.send_message(chat_id=nid, text=f'Заказ #{order_id} подтверждён. Ожидаем исполнителей.')
+                     for nid in NOTIFY_CHAT_IDS)
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        if buyer_tg_id and results and isinstance(results[0], Exception):
             logger.warning('Failed to notify buyer')
-        for nid in NOTIFY_CHAT_IDS:
-            try:
-                await context.bot.send_message(chat_id=nid, text=f'Заказ #{order_id} подтверждён. Ожидаем исполнителей.')
-            except Exception:
-                pass
 
     else:  # reject
-        db_execute('UPDATE orders SET status=?, admin_notes=? WHERE id=?', ('rejected', f'Отклонён админом {user.id}', order_id))
-        caption = build_caption_for_admin_message(order_id, buyer_tg, pubg_id, product_name, price, created_at, 'rejected')
+        await db_execute_async('UPDATE orders SET status=?, admin_notes=? WHERE id=?', ('rejected', f'Отклонён админом {user.id}', order_id))
+        caption = await asyncio.get_running_loop().run_in_executor(_db_executor, build_caption_for_admin_message, order_id, buyer_tg, pubg_id, product_name, price, created_at, 'rejected')
         try:
             await query.edit_message_caption(caption)
         except Exception:
@@ -1266,10 +1706,11 @@ async def admin_decision(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 await context.bot.send_message(chat_id=ADMIN_CHAT_ID, text=caption)
             except Exception:
                 pass
-        try:
-            await context.bot.send_message(chat_id=buyer_row[0][0], text=(f'Ваш заказ #{order_id} был отклонён администратором. Пожалуйста, свяжитесь с поддержкой.'))
-        except Exception:
-            logger.warning('Failed to notify buyer')
+        if buyer_tg_id:
+            try:
+                await context.bot.send_message(chat_id=buyer_tg_id, text=(f'Ваш заказ #{order_id} был отклонён администратором. Пожалуйста, свяжитесь с поддержкой.'))
+            except Exception:
+                logger.warning('Failed to notify buyer')
 
 
 # Performer actions: take or leave
@@ -1293,9 +1734,11 @@ async def performer_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
     user = query.from_user
     worker_id = user.id
-    worker_username = user.username or f'{user.first_name} {user.last_name or ""}'.strip()
+    # store the display name already @-prefixed so renderers don't re-check
+    raw_name = user.username or f'{user.first_name} {user.last_name or ""}'.strip()
+    worker_username = f'@{raw_name}' if raw_name else ''
 
-    order_row = db_execute('SELECT status, product_id, price, created_at FROM orders WHERE id=?', (order_id,), fetch=True)
+    order_row = await db_execute_async(Q_ORDER_STATE, (order_id,), fetch=True)
     if not order_row:
         try:
             await query.answer(text='Заказ не найден.', show_alert=True)
@@ -1310,7 +1753,7 @@ async def performer_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             pass
         return
 
-    current = db_execute('SELECT worker_id FROM order_workers WHERE order_id=?', (order_id,), fetch=True) or []
+    current = await db_execute_async(Q_ORDER_WORKER_IDS, (order_id,), fetch=True) or []
     current_ids = [r[0] for r in current]
 
     if action == 'take':
@@ -1320,14 +1763,23 @@ async def performer_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             except Exception:
                 pass
             return
-        if len(current_ids) >= MAX_WORKERS_PER_ORDER:
+        # conditional insert: the capacity/duplicate checks run inside the
+        # statement, so two workers racing for the last slot can't both win
+        inserted = await db_execute_async(
+            'INSERT INTO order_workers (order_id, worker_id, worker_username, taken_at) '
+            'SELECT ?, ?, ?, ? '
+            'WHERE (SELECT COUNT(*) FROM order_workers WHERE order_id=?) < ? '
+            'AND NOT EXISTS (SELECT 1 FROM order_workers WHERE order_id=? AND worker_id=?) '
+            'RETURNING id',
+            (order_id, worker_id, worker_username, now_ts(), order_id, MAX_WORKERS_PER_ORDER, order_id, worker_id),
+            fetch=True)
+        invalidate_performers(order_id)
+        if not inserted:
             try:
                 await query.answer(text=f'Невозможно взять — максимум {MAX_WORKERS_PER_ORDER} исполнителей уже заняты.', show_alert=True)
             except Exception:
                 pass
             return
-        db_execute('INSERT INTO order_workers (order_id, worker_id, worker_username, taken_at) VALUES (?, ?, ?, ?)',
-                   (order_id, worker_id, worker_username, now_iso()))
         try:
             await query.answer(text='Вы добавлены в исполнители.', show_alert=False)
         except Exception:
@@ -1340,22 +1792,21 @@ async def performer_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             except Exception:
                 pass
             return
-        db_execute('DELETE FROM order_workers WHERE order_id=? AND worker_id=?', (order_id, worker_id))
+        await db_execute_async('DELETE FROM order_workers WHERE order_id=? AND worker_id=?', (order_id, worker_id))
+        invalidate_performers(order_id)
         try:
             await query.answer(text='Вы сняты с выполнения заказа.', show_alert=False)
         except Exception:
             pass
 
-    # update admin message caption
-    buyer_row = db_execute('SELECT u.tg_id, u.username, u.pubg_id, p.name FROM orders o JOIN users u ON o.user_id=u.id JOIN products p ON o.product_id=p.id WHERE o.id=?', (order_id,), fetch=True)
-    if buyer_row:
-        buyer_tg_id, buyer_username, pubg_id, product_name = buyer_row[0]
-        buyer_tg = f'@{buyer_username}' if buyer_username else str(buyer_tg_id)
-    else:
-        buyer_tg = 'неизвестен'
-        pubg_id = None
-        product_name = db_execute('SELECT name FROM products WHERE id=(SELECT product_id FROM orders WHERE id=?)', (order_id,), fetch=True)[0][0]
-    caption = build_caption_for_admin_message(order_id, buyer_tg, pubg_id, product_name, price, created_at, 'paid')
+    # update admin message caption; without a buyer/product row there is
+    # nothing sensible to render, so just leave the old caption alone
+    buyer_row = await db_execute_async(Q_ORDER_BUYER_PRODUCT, (order_id,), fetch=True)
+    if not buyer_row:
+        return
+    buyer_tg_id, buyer_username, pubg_id, product_name = buyer_row[0]
+    buyer_tg = f'@{buyer_username}' if buyer_username else str(buyer_tg_id)
+    caption = await asyncio.get_running_loop().run_in_executor(_db_executor, build_caption_for_admin_message, order_id, buyer_tg, pubg_id, product_name, price, created_at, 'paid')
     kb = build_admin_keyboard_for_order(order_id, 'paid')
 
     try:
@@ -1386,7 +1837,7 @@ async def order_progress_callback(update: Update, context: ContextTypes.DEFAULT_
     worker_id = user.id
 
     # only workers assigned to order can change its progress
-    assigned = db_execute('SELECT worker_id FROM order_workers WHERE order_id=?', (order_id,), fetch=True) or []
+    assigned = await db_execute_async(Q_ORDER_WORKER_IDS, (order_id,), fetch=True) or []
     assigned_ids = [r[0] for r in assigned]
     if worker_id not in assigned_ids and not is_admin_tg(user.id):
         try:
@@ -1395,41 +1846,43 @@ async def order_progress_callback(update: Update, context: ContextTypes.DEFAULT_
             pass
         return
 
-    # get order
-    row = db_execute('SELECT status, user_id, product_id, price, created_at FROM orders WHERE id=?', (order_id,), fetch=True)
+    # get order + buyer + product in one JOIN (was three separate reads)
+    row = await db_execute_async(
+        'SELECT o.status, o.user_id, o.product_id, o.price, o.created_at, '
+        'u.tg_id, u.username, u.pubg_id, p.name '
+        'FROM orders o LEFT JOIN users u ON u.id=o.user_id LEFT JOIN products p ON p.id=o.product_id '
+        'WHERE o.id=?', (order_id,), fetch=True)
     if not row:
         try:
             await q.answer(text='Заказ не найден.', show_alert=True)
         except Exception:
             pass
         return
-    old_status, user_id, product_id, price, created_at = row[0]
+    old_status, user_id, product_id, price, created_at, buyer_tg_id, buyer_username, pubg_id, product_name = row[0]
+    buyer_tg = f'@{buyer_username}' if buyer_username else str(buyer_tg_id if buyer_tg_id is not None else user_id)
+    if product_name is None:
+        product_name = str(product_id)
 
-    # Update timestamps depending on new_status
-    now = now_iso()
+    # Update timestamps depending on new_status; RETURNING hands the fresh
+    # row back without a follow-up SELECT
+    now = now_ts()
     if new_status == 'in_progress':
-        db_execute('UPDATE orders SET status=?, started_at=? WHERE id=?', (new_status, now, order_id))
-    elif new_status == 'delivering':
-        db_execute('UPDATE orders SET status=? WHERE id=?', (new_status, order_id))
+        status_row = (await db_execute_async(
+            'UPDATE orders SET status=?, started_at=? WHERE id=? RETURNING status, started_at, done_at',
+            (new_status, now, order_id), fetch=True))[0]
     elif new_status == 'done':
-        db_execute('UPDATE orders SET status=?, done_at=? WHERE id=?', (new_status, now, order_id))
-    else:
-        db_execute('UPDATE orders SET status=? WHERE id=?', (new_status, order_id))
-
-    # prepare caption update for admin group
-    buyer_row = db_execute('SELECT tg_id, username, pubg_id FROM users WHERE id=?', (user_id,), fetch=True)
-    if buyer_row:
-        buyer_tg = f"@{buyer_row[0][1]}" if buyer_row[0][1] else str(buyer_row[0][0])
-        pubg_id = buyer_row[0][2]
+        status_row = (await db_execute_async(
+            'UPDATE orders SET status=?, done_at=? WHERE id=? RETURNING status, started_at, done_at',
+            (new_status, now, order_id), fetch=True))[0]
+        if old_status != 'done':
+            await db_execute_async('UPDATE products SET completed_count=completed_count+1 WHERE id=?', (product_id,))
+        _invalidate_stats_cache()
     else:
-        buyer_tg = str(user_id)
-        pubg_id = None
-    product_name = db_execute('SELECT name FROM products WHERE id=?', (product_id,), fetch=True)[0][0]
-
-    # update admin message
-    status_row = db_execute('SELECT status, started_at, done_at FROM orders WHERE id=?', (order_id,), fetch=True)[0]
+        status_row = (await db_execute_async(
+            'UPDATE orders SET status=? WHERE id=? RETURNING status, started_at, done_at',
+            (new_status, order_id), fetch=True))[0]
     status_val, started_at, done_at = status_row
-    caption = build_caption_for_admin_message(order_id, buyer_tg, pubg_id, product_name, price, created_at, status_val, started_at, done_at)
+    caption = await asyncio.get_running_loop().run_in_executor(_db_executor, build_caption_for_admin_message, order_id, buyer_tg, pubg_id, product_name, price, created_at, status_val, started_at, done_at)
     kb = build_admin_keyboard_for_order(order_id, status_val)
     try:
         await q.edit_message_caption(caption, reply_markup=kb)
@@ -1439,21 +1892,20 @@ async def order_progress_callback(update: Update, context: ContextTypes.DEFAULT_
         except Exception:
             logger.exception('Failed to update admin message after status change')
 
-    try:
-        # notify buyer about status change
-        await context.bot.send_message(chat_id=buyer_row[0][0], text=f'Статус вашего заказа #{order_id} изменён: {status_val}')
-    except Exception:
-        logger.warning('Failed to notify buyer of status change')
+    if buyer_tg_id:
+        try:
+            # notify buyer about status change
+            await context.bot.send_message(chat_id=buyer_tg_id, text=f'Статус вашего заказа #{order_id} изменён: {status_val}')
+        except Exception:
+            logger.warning('Failed to notify buyer of status change')
 
     # If done => calculate payouts and trigger review flow
     if new_status == 'done':
         await calculate_and_record_payouts(order_id, context)
         # ask buyer to leave reviews for workers
-        # fetch buyer tg_id
-        buyer_tg_id = buyer_row[0][0] if buyer_row else None
         if buyer_tg_id:
             # fetch workers
-            workers = db_execute('SELECT worker_id, worker_username FROM order_workers WHERE order_id=? ORDER BY id', (order_id,), fetch=True)
+            workers = await db_execute_async(Q_ORDER_WORKERS, (order_id,), fetch=True)
             if workers:
                 # send a message with a button to start reviews
                 kb2 = InlineKeyboardMarkup([[InlineKeyboardButton('Оставить отзыв', callback_data=f'leave_review:{order_id}')]])
@@ -1469,11 +1921,11 @@ async def calculate_and_record_payouts(order_id: int, context: ContextTypes.DEFA
     and notify admins + workers.
     Split equally between assigned workers.
     """
-    order = db_execute('SELECT price FROM orders WHERE id=?', (order_id,), fetch=True)
+    order = await db_execute_async('SELECT price FROM orders WHERE id=?', (order_id,), fetch=True)
     if not order:
         return
     price = order[0][0]
-    workers = db_execute('SELECT worker_id, worker_username FROM order_workers WHERE order_id=? ORDER BY id', (order_id,), fetch=True) or []
+    workers = await db_execute_async(Q_ORDER_WORKERS, (order_id,), fetch=True) or []
     if not workers:
         # no workers assigned: notify owner
         try:
@@ -1484,17 +1936,35 @@ async def calculate_and_record_payouts(order_id: int, context: ContextTypes.DEFA
     num = len(workers)
     total_for_workers = round(price * WORKER_PERCENT, 2)
     per_worker = round(total_for_workers / num, 2) if num > 0 else 0.0
-    store = []
-    for w in workers:
-        wid = w[0]
-        db_execute('INSERT INTO worker_payouts (order_id, worker_id, amount, created_at) VALUES (?, ?, ?, ?)',
-                   (order_id, wid, per_worker, now_iso()))
-        store.append((wid, per_worker, w[1] or ''))
-    # notify admin(s) about payouts
-    summary_lines = [f'Заказ #{order_id} выполнен — общая сумма: {price}₽', f'Всего исполнителей: {num}', f'Доля исполнителей (в сумме): {total_for_workers}₽', 'Выплаты:']
-    for wid, amount, wname in store:
-        summary_lines.append(f'- @{wname or str(wid)}: {amount}₽')
-    summary = '\n'.join(summary_lines)
+    ts = now_ts()
+    store = [(w[0], per_worker, w[1] or '') for w in workers]
+    summary = (
+        f'Заказ #{order_id} выполнен — общая сумма: {price}₽\n'
+        f'Всего исполнителей: {num}\n'
+        f'Доля исполнителей (в сумме): {total_for_workers}₽\n'
+        'Выплаты:\n'
+        + '\n'.join(f'- {wname or wid}: {amount}₽' for wid, amount, wname in store)
+    )
+    # the payout transaction (one commit for all rows) and the admin/worker
+    # notifications are independent: run them concurrently so wall time is
+    # max(db commit, slowest send) rather than the sum
+    results = await asyncio.gather(
+        db_execute_many_async(
+            'INSERT INTO worker_payouts (order_id, worker_id, amount, created_at) VALUES (?, ?, ?, ?)',
+            [(order_id, wid, per_worker, ts) for wid, _amount, _wname in store]),
+        _send_payout_summary(context, summary),
+        *(_send_limited(context.bot.send_message(chat_id=wid, text=f'Заказ #{order_id} выполнен. Ваша выплата: {amount}₽ (список выплат доступен админам).'))
+          for wid, amount, wname in store),
+        return_exceptions=True,
+    )
+    if isinstance(results[0], Exception):
+        logger.error('Failed to record payouts for order %s: %s', order_id, results[0])
+    for (wid, _amount, _wname), res in zip(store, results[2:]):
+        if isinstance(res, Exception):
+            logger.warning('Failed to notify worker %s', wid)
+
+
+async def _send_payout_summary(context: ContextTypes.DEFAULT_TYPE, summary: str) -> None:
     try:
         await context.bot.send_message(chat_id=ADMIN_CHAT_ID, text=summary)
     except Exception:
@@ -1503,13 +1973,6 @@ async def calculate_and_record_payouts(order_id: int, context: ContextTypes.DEFA
         except Exception:
             pass
 
-    # notify each worker privately
-    for wid, amount, wname in store:
-        try:
-            await context.bot.send_message(chat_id=wid, text=f'Заказ #{order_id} выполнен. Ваша выплата: {amount}₽ (список выплат доступен админам).')
-        except Exception:
-            logger.warning('Failed to notify worker %s', wid)
-
 
 # Callback to open review flow (buttons)
 async def leave_review_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -1526,7 +1989,7 @@ async def leave_review_callback(update: Update, context: ContextTypes.DEFAULT_TY
     except ValueError:
         return
     # fetch workers for this order
-    workers = db_execute('SELECT worker_id, worker_username FROM order_workers WHERE order_id=? ORDER BY id', (order_id,), fetch=True)
+    workers = await db_execute_async(Q_ORDER_WORKERS, (order_id,), fetch=True)
     if not workers:
         try:
             await q.message.reply_text('На этот заказ нет назначенных исполнителей.')
@@ -1536,18 +1999,21 @@ async def leave_review_callback(update: Update, context: ContextTypes.DEFAULT_TY
     # If only one worker -> ask rating directly
     if len(workers) == 1:
         wid, wname = workers[0]
-        context.user_data['review_flow'] = {'stage': 'awaiting_rating', 'order_id': order_id, 'worker_id': wid, 'done_workers': []}
+        # don't lose reviews collected by a previous, unfinished flow
+        await _flush_pending_reviews(context.user_data.pop('review_flow', None))
+        context.user_data['review_flow'] = {'stage': 'awaiting_rating', 'order_id': order_id, 'worker_id': wid, 'done_workers': [], 'workers': workers}
         try:
-            await q.message.reply_text(f'Оцените исполнителя @{wname} (1-5)', reply_markup=CANCEL_BUTTON)
+            await q.message.reply_text(f'Оцените исполнителя {wname or wid} (1-5)', reply_markup=CANCEL_BUTTON)
         except Exception:
             pass
         return
     # multiple workers -> present inline list to choose whom to review (or do all sequentially)
-    kb_rows = []
-    for wid, wname in workers:
-        kb_rows.append([InlineKeyboardButton(text=f'@{wname}', callback_data=f'review_worker:{order_id}:{wid}')])
+    kb = InlineKeyboardMarkup([
+        [InlineKeyboardButton(text=f'{wname or wid}', callback_data=f'review_worker:{order_id}:{wid}')]
+        for wid, wname in workers
+    ])
     try:
-        await q.message.reply_text('Выберите исполнителя для отзыва (можно повторять для всех):', reply_markup=InlineKeyboardMarkup(kb_rows))
+        await q.message.reply_text('Выберите исполнителя для отзыва (можно повторять для всех):', reply_markup=kb)
     except Exception:
         pass
 
@@ -1567,13 +2033,15 @@ async def review_worker_callback(update: Update, context: ContextTypes.DEFAULT_T
         worker_id = int(wid_str)
     except ValueError:
         return
-    # store flow
-    context.user_data['review_flow'] = {'stage': 'awaiting_rating', 'order_id': order_id, 'worker_id': worker_id, 'done_workers': []}
-    # fetch worker username
-    row = db_execute('SELECT worker_username FROM order_workers WHERE order_id=? AND worker_id=?', (order_id, worker_id), fetch=True)
-    wname = row[0][0] if row else str(worker_id)
+    # fetch the full worker list once; the flow reuses it for the remaining reviews
+    workers = await db_execute_async(Q_ORDER_WORKERS, (order_id,), fetch=True) or []
+    # don't lose reviews collected by a previous, unfinished flow (the worker
+    # picker invites tapping several buttons in a row)
+    await _flush_pending_reviews(context.user_data.pop('review_flow', None))
+    context.user_data['review_flow'] = {'stage': 'awaiting_rating', 'order_id': order_id, 'worker_id': worker_id, 'done_workers': [], 'workers': workers}
+    wname = next((w[1] for w in workers if w[0] == worker_id), str(worker_id))
     try:
-        await q.message.reply_text(f'Оцените исполнителя @{wname} (1-5)', reply_markup=CANCEL_BUTTON)
+        await q.message.reply_text(f'Оцените исполнителя {wname or worker_id} (1-5)', reply_markup=CANCEL_BUTTON)
     except Exception:
         pass
 
@@ -1606,8 +2074,8 @@ async def add_product_text_handler(update: Update, context: ContextTypes.DEFAULT
     except Exception:
         await update.message.reply_text('Неверный формат. Пример: 300|Сопровождение|Быстрое сопровождение', reply_markup=ADMIN_PANEL_KB)
         return
-    db_execute('INSERT INTO products (name, description, price, created_at) VALUES (?, ?, ?, ?)',
-               (name, desc, price, now_iso()))
+    await db_execute_async('INSERT INTO products (name, description, price, created_at) VALUES (?, ?, ?, ?)',
+               (name, desc, price, now_ts()))
     await update.message.reply_text(f'Товар добавлен: {name} — {price}₽', reply_markup=MAIN_MENU)
 
 
@@ -1617,24 +2085,39 @@ async def list_orders_admin(update: Update, context: ContextTypes.DEFAULT_TYPE)
         if update.message:
             await update.message.reply_text('Только админам.')
         return
-    rows = db_execute(
-        'SELECT o.id, u.tg_id, u.pubg_id, p.name, o.price, o.status, o.created_at FROM orders o JOIN users u ON o.user_id=u.id JOIN products p ON o.product_id=p.id ORDER BY o.id DESC LIMIT 50',
+    # orders + performers in one statement: the LEFT JOIN/GROUP_CONCAT
+    # replaces the separate batched performer prefetch
+    rows = await db_execute_async(
+        'SELECT o.id, u.tg_id, u.pubg_id, p.name, o.price, o.status, o.created_at, '
+        "GROUP_CONCAT(COALESCE(NULLIF(ow.worker_username, ''), CAST(ow.worker_id AS TEXT)), ', ') "
+        'FROM orders o JOIN users u ON o.user_id=u.id JOIN products p ON o.product_id=p.id '
+        'LEFT JOIN order_workers ow ON ow.order_id=o.id '
+        'GROUP BY o.id ORDER BY o.id DESC LIMIT 50',
         fetch=True)
     if not rows:
         await update.message.reply_text('Заказов нет.', reply_markup=MAIN_MENU)
         return
     text_lines = []
     for r in rows:
-        oid, tg_id, pubg_id, pname, price, status, created = r
-        perf_rows = db_execute('SELECT worker_username FROM order_workers WHERE order_id=? ORDER BY id', (oid,), fetch=True)
-        perflist = ', '.join([pr[0] or str(pr[0]) for pr in perf_rows]) if perf_rows else '-'
-        text_lines.append(f'#{oid} {pname} {price}₽ {status} tg:{tg_id} pubg:{pubg_id or "-"} — Исполнители: {perflist} — {created}')
-    big = '\n'.join(text_lines)
-    if len(big) <= 4000:
-        await update.message.reply_text(big, reply_markup=MAIN_MENU)
+        oid, tg_id, pubg_id, pname, price, status, created, perflist = r
+        text_lines.append(f'#{oid} {pname} {price}₽ {status} tg:{tg_id} pubg:{pubg_id or "-"} — Исполнители: {perflist or "-"} — {_fmt_ts(created)}')
+    # chunk at line boundaries in one pass instead of slicing one huge string
+    chunks = []
+    buf = []
+    buf_len = 0
+    for line in text_lines:
+        if buf and buf_len + len(line) + 1 > 3500:
+            chunks.append('\n'.join(buf))
+            buf = []
+            buf_len = 0
+        buf.append(line)
+        buf_len += len(line) + 1
+    if buf:
+        chunks.append('\n'.join(buf))
+    if len(chunks) == 1:
+        await update.message.reply_text(chunks[0], reply_markup=MAIN_MENU)
     else:
-        parts = [big[i:i+3500] for i in range(0, len(big), 3500)]
-        for p in parts:
+        for p in chunks:
             await update.message.reply_text(p)
         await update.message.reply_text('Конец списка.', reply_markup=MAIN_MENU)
 
@@ -1647,10 +2130,7 @@ async def setphoto_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     msg = update.message
     if msg is None:
         return
-    if not msg.reply_to_message or not msg.reply_to_message.photo:
-        await msg.reply_text('Ответьте командой на сообщение с фото товара, например: /setphoto 3')
-        return
-
+    # cheapest checks first: args before walking the replied-to message
     args = context.args or []
     if not args:
         await msg.reply_text('Использование: /setphoto <product_id> (в ответ на фото)')
@@ -1661,10 +2141,12 @@ async def setphoto_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await msg.reply_text('Неверный product_id')
         return
 
-    photo = msg.reply_to_message.photo[-1]
-    file_id = photo.file_id
+    if not msg.reply_to_message or not msg.reply_to_message.photo:
+        await msg.reply_text('Ответьте командой на сообщение с фото товара, например: /setphoto 3')
+        return
 
-    db_execute('UPDATE products SET photo=? WHERE id=?', (file_id, pid))
+    file_id = msg.reply_to_message.photo[-1].file_id
+    await db_execute_async('UPDATE products SET photo=? WHERE id=?', (file_id, pid))
     await msg.reply_text(f'Фото установлено для товара {pid}', reply_markup=ADMIN_PANEL_KB)
 
 
@@ -1684,44 +2166,78 @@ async def add_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         await update.message.reply_text('Цена должна быть числом')
         return
     desc = ' '.join(args[2:]) if len(args) > 2 else ''
-    db_execute('INSERT INTO products (name, description, price, created_at) VALUES (?, ?, ?, ?)', (name, desc, price, now_iso()))
+    await db_execute_async('INSERT INTO products (name, description, price, created_at) VALUES (?, ?, ?, ?)', (name, desc, price, now_ts()))
     await update.message.reply_text(f'Товар добавлен: {name} — {price}₽', reply_markup=ADMIN_PANEL_KB)
 
 
+# Bot stats for admins (📊 Статистика бота / /stats)
+# The aggregates barely change second-to-second, so cache the rendered text
+# for 30s instead of re-running the COUNT/SUM queries on every tap.
+_stats_cache = {'ts': 0.0, 'text': None}
+STATS_CACHE_TTL = 30.0
+
+
+def _invalidate_stats_cache() -> None:
+    _stats_cache['ts'] = 0.0
+
+
+async def bot_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    user = update.effective_user
+    if not is_admin_tg(user.id):
+        if update.message:
+            await update.message.reply_text('Только админам.')
+        return
+    now = time.monotonic()
+    text = _stats_cache['text']
+    if text is None or now - _stats_cache['ts'] >= STATS_CACHE_TTL:
+        # One pass over orders plus two scalar subqueries instead of six
+        # separate statements.
+        row = (await db_execute_async(
+            'SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM products), COUNT(*), '
+            "COALESCE(SUM(status='paid'), 0), COALESCE(SUM(status='done'), 0), "
+            "COALESCE(SUM(CASE WHEN status IN ('paid','done') THEN price ELSE 0 END), 0) FROM orders",
+            fetch=True))[0]
+        users_count, products_count, orders_count, paid_count, done_count, revenue = row
+        text = '\n'.join([
+            '📊 Статистика бота',
+            f'Пользователей: {users_count}',
+            f'Товаров: {products_count}',
+            f'Заказов: {orders_count}',
+            f'Оплачено: {paid_count}',
+            f'Выполнено: {done_count}',
+            f'Оборот: {revenue}₽',
+        ])
+        _stats_cache.update(ts=now, text=text)
+    if update.message:
+        await update.message.reply_text(text, reply_markup=ADMIN_PANEL_KB)
+
+
 # Worker stats command (/worker)
 async def worker_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user = update.effective_user
     if user is None:
         return
     wid = user.id
-    # total taken
-    total_taken_row = db_execute('SELECT COUNT(*) FROM order_workers WHERE worker_id=?', (wid,), fetch=True)
-    total_taken = total_taken_row[0][0] if total_taken_row else 0
-    # total completed (orders where this worker is in order_workers and order status == done)
-    total_done_row = db_execute('SELECT COUNT(DISTINCT o.id) FROM orders o JOIN order_workers w ON o.id=w.order_id WHERE w.worker_id=? AND o.status=?', (wid, 'done'), fetch=True)
-    total_done = total_done_row[0][0] if total_done_row else 0
-    # avg time: for orders where worker took and order done -> average(done_at - taken_at)
-    rows = db_execute('SELECT o.created_at, o.started_at, o.done_at, w.taken_at FROM orders o JOIN order_workers w ON o.id=w.order_id WHERE w.worker_id=? AND o.status=?', (wid, 'done'), fetch=True)
-    avg_secs = None
-    if rows:
-        deltas = []
-        for created_at, started_at, done_at, taken_at in rows:
-            try:
-                dt_taken = datetime.fromisoformat(taken_at) if taken_at else None
-                dt_done = datetime.fromisoformat(done_at) if done_at else None
-                if dt_taken and dt_done:
-                    delta = (dt_done - dt_taken).total_seconds()
-                    if delta >= 0:
-                        deltas.append(delta)
-            except Exception:
-                pass
-        if deltas:
-            avg_secs = sum(deltas) / len(deltas)
+    # everything in one statement: taken count and completion-time average
+    # over order_workers (delta computed inside SQLite, tolerating both epoch
+    # ints and legacy ISO strings), plus the trigger-maintained aggregates
+    row = (await db_execute_async(
+        'SELECT COUNT(*), AVG(CASE WHEN d.delta >= 0 THEN d.delta END), '
+        '(SELECT sum_rating FROM worker_stats WHERE worker_id=?), '
+        '(SELECT n_reviews FROM worker_stats WHERE worker_id=?), '
+        '(SELECT total_payout FROM worker_stats WHERE worker_id=?), '
+        '(SELECT n_done FROM worker_stats WHERE worker_id=?) '
+        'FROM (SELECT CASE '
+        "WHEN o.status='done' AND ow.taken_at IS NOT NULL AND o.done_at IS NOT NULL THEN "
+        "(CASE WHEN typeof(o.done_at) IN ('integer','real') THEN o.done_at*1.0 ELSE strftime('%s', o.done_at)*1.0 END) - "
+        "(CASE WHEN typeof(ow.taken_at) IN ('integer','real') THEN ow.taken_at*1.0 ELSE strftime('%s', ow.taken_at)*1.0 END) "
+        'END AS delta FROM order_workers ow LEFT JOIN orders o ON o.id=ow.order_id WHERE ow.worker_id=?) d',
+        (wid, wid, wid, wid, wid), fetch=True))[0]
+    total_taken, avg_secs, sum_rating, n_reviews, total_payout, total_done = row
+    total_payout = total_payout or 0.0
+    total_done = total_done or 0
     avg_time = f"{int(avg_secs//60)} мин" if avg_secs else "—"
-
-    # average rating for this worker
-    rating_row = db_execute('SELECT AVG(rating) FROM reviews WHERE worker_id=?', (wid,), fetch=True)
-    avg_rating = rating_row[0][0] if rating_row and rating_row[0][0] is not None else None
+    avg_rating = (sum_rating / n_reviews) if n_reviews else None
 
     text_lines = [
         f'🧾 Статистика исполнителя @{user.username or user.first_name}',
@@ -1729,21 +2245,96 @@ async def worker_stats_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         f'Выполнено: {total_done}',
         f'Среднее время выполнения: {avg_time}',
         f'Средний рейтинг: {avg_rating:.2f}' if avg_rating else 'Средний рейтинг: —',
+        f'Всего выплачено: {total_payout}₽',
     ]
     await update.message.reply_text('\n'.join(text_lines), reply_markup=MAIN_MENU)
 
 
+# Background tasks spawned from handlers: the event loop only keeps a weak
+# reference to tasks, so hold strong ones here until they finish.
+_BG_TASKS: set = set()
+
+
+def _bg_task_done(task) -> None:
+    _BG_TASKS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning('Background task failed: %s', task.exception())
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_bg_task_done)
+
+
 # Global error handler
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     logger.error(msg="Exception while handling an update:", exc_info=context.error)
     try:
-        app = context.application
-        await app.bot.send_message(chat_id=OWNER_ID, text=f'Error: {context.error}')
+        # fire-and-forget: don't hold up the error path on a Telegram round-trip
+        _spawn(context.application.bot.send_message(chat_id=OWNER_ID, text=f'Error: {context.error}'))
     except Exception:
         pass
+# Callback dispatch table: data prefix -> handler. Supersedes the per-handler
+# regex patterns - PTB now invokes one handler and we do a single dict probe.
+CB_ROUTES = {
+    'buy': buy_callback,
+    'detail': product_detail_callback,
+    'confirm': admin_decision,
+    'reject': admin_decision,
+    'take': performer_action,
+    'leave': performer_action,
+    'status': order_progress_callback,
+    'leave_review': leave_review_callback,
+    'review_worker': review_worker_callback,
+    'editfield': editfield_callback,
+    'delete': delete_callback,
+    'edit': edit_callback,
+}
+
+
+async def callback_dispatch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    q = update.callback_query
+    if q is None or not q.data:
+        return
+    handler = CB_ROUTES.get(q.data.partition(':')[0])
+    if handler is not None:
+        await handler(update, context)
+
+
+# Menu dispatch tables for text_router (populated once all handlers exist).
+ROUTES = {
+    '📦 Каталог': products_handler,
+    '🧾 Мои заказы': my_orders,
+    '🎮 Привязать PUBG ID': pubg_prompt_handler,
+    '📞 Поддержка': support_handler,
+    '↩️ Назад': back_to_menu_handler,
+}
+
+ADMIN_ROUTES = {
+    '➕ Добавить товар': admin_add_product_start,
+    '✏️ Редактировать товар': admin_edit_product_start,
+    '🗑️ Удалить товар': admin_delete_product_start,
+    '📋 Список заказов': list_orders_admin,
+    '📊 Статистика бота': bot_stats_handler,
+}
+
+
 def build_app():
     init_db()
-    app = ApplicationBuilder().token(TG_BOT_TOKEN).build()
+    # Default HTTPX pool is tiny; size it so concurrent handlers and the
+    # gather() notification fan-outs don't stall on "pool is occupied".
+    app = (
+        ApplicationBuilder()
+        .token(TG_BOT_TOKEN)
+        .connection_pool_size(64)
+        .pool_timeout(30)
+        .get_updates_connection_pool_size(16)
+        .concurrent_updates(32)
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
 
     # ignore messages in admin group (keeps bot quiet there)
     app.add_handler(MessageHandler(filters.Chat(ADMIN_CHAT_ID) & filters.ALL, ignore_admin_group), group=0)
@@ -1756,28 +2347,21 @@ def build_app():
     # photo router (routes admin product photos -> product flows, else -> payment handler)
     app.add_handler(MessageHandler(filters.PHOTO & ~filters.COMMAND, photo_router), group=1)
 
-    # callbacks for product browsing / buy / details
-    app.add_handler(CallbackQueryHandler(buy_callback, pattern=r'^buy:'), group=1)
-    app.add_handler(CallbackQueryHandler(product_detail_callback, pattern=r'^detail:'), group=1)
-
-    # admin / performer callbacks
-    app.add_handler(CallbackQueryHandler(admin_decision, pattern=r'^(confirm:|reject:)'), group=2)
-    app.add_handler(CallbackQueryHandler(performer_action, pattern=r'^(take:|leave:)'), group=2)
-    app.add_handler(CallbackQueryHandler(order_progress_callback, pattern=r'^status:'), group=2)
-    app.add_handler(CallbackQueryHandler(leave_review_callback, pattern=r'^leave_review:'), group=2)
-    app.add_handler(CallbackQueryHandler(review_worker_callback, pattern=r'^review_worker:'), group=2)
-
-    # product edit/delete callbacks
-    app.add_handler(CallbackQueryHandler(editfield_callback, pattern=r'^editfield:'), group=2)
-    app.add_handler(CallbackQueryHandler(delete_callback, pattern=r'^delete:'), group=2)
-    app.add_handler(CallbackQueryHandler(edit_callback, pattern=r'^edit:'), group=2)  # opens edit flow from detail
+    # all callback queries route through one dispatcher: a dict probe on the
+    # data prefix instead of walking a dozen pattern predicates
+    app.add_handler(CallbackQueryHandler(callback_dispatch), group=1)
 
     # admin flows / commands
     app.add_handler(CommandHandler('admin', admin_menu), group=1)
+    app.add_handler(CommandHandler('stats', bot_stats_handler), group=1)
     app.add_handler(CommandHandler('add', add_command_handler), group=1)
     app.add_handler(CommandHandler('setphoto', setphoto_handler), group=1)
-    # legacy quick-add (kept)
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, add_product_text_handler), group=1)
+    # legacy quick-add ('price|name|desc') is reached through text_router,
+    # so it doesn't need its own MessageHandler in the dispatch chain
+
+    # CloudTips polling (self-rescheduling, see cloudtips_poll_job)
+    if CLOUDTIPS_POLL_URL and app.job_queue:
+        app.job_queue.run_once(cloudtips_poll_job, when=POLLING_MIN_INTERVAL, data=POLLING_MIN_INTERVAL, name='cloudtips_poll')
 
     app.add_error_handler(error_handler)
     return app